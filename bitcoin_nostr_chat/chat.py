@@ -28,6 +28,7 @@
 
 
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from typing import List
 
@@ -60,6 +61,9 @@ from nostr_sdk import PublicKey
 from PyQt6.QtCore import QObject, pyqtSignal
 from PyQt6.QtWidgets import QMessageBox
 
+# Data.from_str probes several formats, which can stall the ui for large files
+_FILE_PARSE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="file_to_dm")
+
 
 class BaseChat(QObject):
     signal_attachement_clicked = pyqtSignal(FileObject)
@@ -110,12 +114,14 @@ class BaseChat(QObject):
 
     def clear_chat_from_memory(self):
         processed_dms = self.group_chat.dm_connection.async_dm_connection.notification_handler.processed_dms
-        for dm in self.gui.dms:
+        for dm in self.gui.iter_dms():
             if dm in processed_dms:
                 processed_dms.remove(dm)
 
 
 class Chat(BaseChat):
+    signal_file_parsed = pyqtSignal(Future)  # Future[BitcoinDM]
+
     def __init__(
         self,
         network: bdk.Network,
@@ -137,6 +143,8 @@ class Chat(BaseChat):
         self.group_chat.signal_dm.connect(self.add_to_chat)
         self.gui.signal_on_message_send.connect(self.on_send_message_in_groupchat)
         self.gui.signal_share_filecontent.connect(self.on_share_file_in_groupchat)
+        # the future is done in the worker thread, this is queued back into the main thread
+        self.signal_file_parsed.connect(self.on_file_parsed)
 
     def add_to_chat(self, dm: BitcoinDM):
         if not dm.author:
@@ -172,8 +180,14 @@ class Chat(BaseChat):
         self.signal_send_dm.emit(dm)
 
     def on_share_file_in_groupchat(self, file_content: str, file_name: str):
+        future = _FILE_PARSE_EXECUTOR.submit(
+            self._file_to_dm, file_content=file_content, label=self.send_label, file_name=file_name
+        )
+        future.add_done_callback(self.signal_file_parsed.emit)
+
+    def on_file_parsed(self, future: Future):
         try:
-            dm = self._file_to_dm(file_content=file_content, label=self.send_label, file_name=file_name)
+            dm: BitcoinDM = future.result()
         except Exception:
             create_custom_message_box(
                 QMessageBox.Icon.Warning, "Error", self.tr("You can only send only PSBTs or transactions")
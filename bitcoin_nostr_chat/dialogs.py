@@ -27,8 +27,11 @@
 # SOFTWARE.
 
 
+import locale
 import logging
-from typing import Optional
+import mmap
+import os
+from typing import Optional, Union
 
 from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import (
@@ -44,29 +47,40 @@ from PyQt6.QtWidgets import (
 logger = logging.getLogger(__name__)
 
 
+def _decode_text(data: Union[bytes, mmap.mmap]) -> Optional[str]:
+    "Returns the text as open(file_path, 'r').read() would, or None if the data is binary"
+    if data.find(b"\0") != -1:  # found null byte
+        return None
+    try:
+        text = str(data, locale.getpreferredencoding(False))
+    except UnicodeDecodeError:
+        return None
+    # universal newlines, like in text mode
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
 def is_binary(file_path: str):
     """Check if a file is binary or text.
 
     Returns True if binary, False if text.
     """
-    try:
-        with open(file_path, "r") as f:
-            for chunk in iter(lambda: f.read(1024), ""):
-                if "\0" in chunk:  # found null byte
-                    return True
-    except UnicodeDecodeError:
-        return True
-
-    return False
+    with open(file_path, "rb") as f:
+        return _decode_text(f.read()) is None
 
 
 def file_to_str(file_path: str):
-    if is_binary(file_path):
-        with open(file_path, "rb") as f:
-            return bytes(f.read()).hex()
-    else:
-        with open(file_path, "r") as f:
-            return f.read()
+    with open(file_path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            return ""
+        # map the file instead of reading it, such that only the resulting str is held in memory
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            text = _decode_text(data)
+            if text is not None:
+                return text
+            with memoryview(data) as view:
+                return view.hex()
 
 
 def create_custom_message_box(
@@ -65,7 +65,7 @@ class LabelConnector(QObject):
 
     def on_dm(self, dm: BitcoinDM):
         if not dm.author:
-            logger.debug(f"Dropping {dm}, because not author, and with that author can be determined.")
+            logger.debug("Dropping %s, because not author, and with that author can be determined.", dm)
             return
 
         if dm.data and dm.data.data_type == DataType.LabelsBip329:
@@ -31,6 +31,7 @@ import asyncio
 import json
 import logging
 import threading
+import time
 from abc import abstractmethod
 from datetime import datetime, timedelta
 
@@ -50,17 +51,34 @@ from nostr_sdk import (
 )
 
 from bitcoin_nostr_chat import DEFAULT_USE_COMPRESSION
-from bitcoin_nostr_chat.default_relays import get_default_delays, get_preferred_relays
 from bitcoin_nostr_chat.utils import filtered_for_init
 
 logger = logging.getLogger(__name__)
 
 import base64
 import enum
+import os
+import struct
 import zlib
-from collections import deque
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+from typing import (
+    IO,
+    AbstractSet,
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 
 import bdkpython as bdk
 import cbor2
@@ -87,6 +105,26 @@ from nostr_sdk import (
 from PyQt6.QtCore import QObject, QThread, QTimer, pyqtBoundSignal, pyqtSignal
 
 DM_KIND = KindEnum.PRIVATE_DIRECT_MESSAGE()
+NIP04_DM_KIND = KindEnum.ENCRYPTED_DIRECT_MESSAGE()
+GIFT_WRAP_KIND = KindEnum.GIFT_WRAP()
+SUBSCRIBED_KINDS = [Kind.from_enum(DM_KIND), Kind.from_enum(GIFT_WRAP_KIND)]
+# Kind.as_u16 returns a plain int, which is cheaper to compare than the enum from as_enum
+DM_KIND_U16 = Kind.from_enum(DM_KIND).as_u16()
+NIP04_DM_KIND_U16 = Kind.from_enum(NIP04_DM_KIND).as_u16()
+GIFT_WRAP_KIND_U16 = Kind.from_enum(GIFT_WRAP_KIND).as_u16()
+RELAY_STATUS_CONNECTED = RelayStatus.CONNECTED
+
+# Event.from_json (signature verification) and decryption run in rust without the GIL,
+# so restoring and replaying large dumps is spread over several threads
+_DUMP_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="nostr_dump")
+
+# untrusted events are kept per author, so a single key can only rotate its own events.
+# Keys are free to create though, so many spam keys can still push out the bucket of an idle author.
+UNTRUSTED_EVENTS_PER_AUTHOR = 256
+MAX_UNTRUSTED_AUTHORS = 40
+
+# characters dropped from pasted relay lists (json style quotes and separators)
+_RELAY_TEXT_STRIP = str.maketrans("", "", '",')
 
 
 def fetch_and_parse_json(url: str) -> Optional[Any]:
@@ -110,7 +148,7 @@ def fetch_and_parse_json(url: str) -> Optional[Any]:
 
 
 def get_recipient_public_key_of_nip04(event: Event) -> Optional[PublicKey]:
-    if event.kind().as_enum() != DM_KIND:
+    if event.kind().as_u16() != DM_KIND_U16:
         return None
     for tag in event.tags():
         tag_standart = tag.as_standardized()
@@ -123,41 +161,42 @@ def get_recipient_public_key_of_nip04(event: Event) -> Optional[PublicKey]:
 @dataclass
 class RelayList:
     relays: List[str]
-    last_updated: datetime
+    last_updated: float  # unix timestamp. A datetime is converted in __post_init__
     max_age: Optional[int] = 30  # days,  "None" means it is disabled
 
+    def __post_init__(self):
+        # dumps of older versions hold a datetime
+        last_updated: Union[float, datetime] = self.last_updated
+        if isinstance(last_updated, datetime):
+            self.last_updated = last_updated.timestamp()
+
     @classmethod
     def from_internet(cls) -> "RelayList":
-        return RelayList(relays=cls.get_relays(), last_updated=datetime.now())
+        return RelayList(relays=cls.get_relays(), last_updated=time.time())
 
     @classmethod
     def from_text(cls, text: str, max_age=None) -> "RelayList":
-        text = text.replace('"', "").replace(",", "")
-        relays = [line.strip() for line in text.strip().split("\n")]
-        relays = [line for line in relays if line]
-        return RelayList(relays=relays, last_updated=datetime.now(), max_age=max_age)
+        relays = [line for line in map(str.strip, text.translate(_RELAY_TEXT_STRIP).splitlines()) if line]
+        return RelayList(relays=relays, last_updated=time.time(), max_age=max_age)
 
     def get_subset(self, size: int) -> List[str]:
         return self.relays[: min(len(self.relays), size)]
 
     def dump(self) -> Dict:
-        d = self.__dict__.copy()
-        d["last_updated"] = self.last_updated.timestamp()
-        return d
+        return self.__dict__.copy()
 
     @classmethod
     def from_dump(cls, d: Dict) -> "RelayList":
-        d["last_updated"] = datetime.fromtimestamp(d["last_updated"])
         return cls(**filtered_for_init(d, cls))
 
     def update_relays(self):
         self.relays = self.get_relays()
-        self.last_updated = datetime.now()
+        self.last_updated = time.time()
 
     def is_stale(self) -> bool:
         if not self.max_age:
             return False
-        return self.last_updated < datetime.now() - timedelta(days=self.max_age)
+        return time.time() - self.last_updated > self.max_age * 86400
 
     def update_if_stale(self):
         if self.is_stale():
@@ -165,6 +204,10 @@ class RelayList:
 
     @classmethod
     def _postprocess_relays(cls, relays) -> List[str]:
+        # the relay lists are only needed when (re)fetching relays,
+        # so do not load them when importing this module
+        from bitcoin_nostr_chat.default_relays import get_preferred_relays
+
         preferred_relays = get_preferred_relays()
         return preferred_relays + [r for r in relays if r not in preferred_relays]
 
@@ -187,11 +230,106 @@ class RelayList:
         # if all_relays:
         #     return cls._postprocess_relays(all_relays)
 
+        from bitcoin_nostr_chat.default_relays import get_default_delays
+
         logger.debug(f"Return default list")
         return cls._postprocess_relays(get_default_delays())
 
 
+# Serialized DMs start with a format tag.  The ":" can neither occur in base85,
+# nor at the second position of a json object, such that untagged payloads
+# of older versions can still be recognized and decoded.
+FORMAT_TAG_JSON = "J:"
+FORMAT_TAG_ZLIB_CBOR_B85 = "Z:"
+FORMAT_TAG_ZLIB_CBOR_B64 = "B:"
+
+# Released clients only decode untagged json and base85 payloads.  The tagged formats
+# are decoded already, but only emitted once enough clients can read them.
+EMIT_FORMAT_TAGS = False
+
+# payloads below this size (in cbor bytes) are smaller as plain json than
+# after deflate + base64, so use_compression is ignored for them
+MIN_COMPRESSION_SIZE = 256
+
+
+def decode_json(data: str) -> Dict:
+    return json.loads(data)
+
+
+_B85_ALPHABET = b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz!#$%&()*+-;<=>?@^_`{|}~"
+_B85_DIGITS = bytes.maketrans(_B85_ALPHABET, bytes(range(85)))
+
+
+def b85decode(data: str) -> bytes:
+    """Same result as base64.b85decode, but maps the characters with one bytes.translate
+    and combines each 5 digit group in a single expression instead of a per character loop.
+    """
+    b = data.encode("ascii")
+    if b.translate(None, _B85_ALPHABET):
+        raise ValueError("bad base85 character")
+    padding = -len(b) % 5
+    d = (b + b"~" * padding).translate(_B85_DIGITS)
+    try:
+        decoded = struct.pack(
+            f"!{len(d) // 5}I",
+            *[
+                d0 * 52200625 + d1 * 614125 + d2 * 7225 + d3 * 85 + d4
+                for d0, d1, d2, d3, d4 in zip(d[0::5], d[1::5], d[2::5], d[3::5], d[4::5])
+            ],
+        )
+    except struct.error:
+        raise ValueError("base85 overflow") from None
+    return decoded[: len(decoded) - padding] if padding else decoded
+
+
+def decode_zlib_cbor_b85(data: str) -> Dict:
+    return cbor2.loads(zlib.decompress(b85decode(data)))
+
+
+def decode_zlib_cbor_b64(data: str) -> Dict:
+    return cbor2.loads(zlib.decompress(base64.b64decode(data, validate=True)))
+
+
+def decode_untagged(data: str) -> Dict:
+    "Decodes the payloads of versions, that did not prepend a format tag"
+    if data.startswith("{"):
+        # if it is likely a json string, try this method first
+        try:
+            return decode_json(data)
+        except Exception:
+            pass
+    return decode_zlib_cbor_b85(data)
+
+
+FORMAT_DECODERS: Dict[str, Callable[[str], Dict]] = {
+    FORMAT_TAG_JSON: decode_json,
+    FORMAT_TAG_ZLIB_CBOR_B85: decode_zlib_cbor_b85,
+    FORMAT_TAG_ZLIB_CBOR_B64: decode_zlib_cbor_b64,
+}
+
+
+class ZlibWriter:
+    "File-like object, that compresses everything written to it"
+
+    def __init__(self) -> None:
+        self.compressor = zlib.compressobj()
+        self.chunks: List[bytes] = []
+        self.bytes_written = 0
+
+    def write(self, data: bytes) -> int:
+        self.bytes_written += len(data)
+        self.chunks.append(self.compressor.compress(data))
+        return len(data)
+
+    def getvalue(self) -> bytes:
+        self.chunks.append(self.compressor.flush())
+        return b"".join(self.chunks)
+
+
 class BaseDM:
+    # whether AsyncDmConnection.dump includes dms of this class
+    persist_in_dump = True
+
     def __init__(
         self,
         created_at: datetime,
@@ -205,6 +343,9 @@ class BaseDM:
         self.created_at = created_at
         self.use_compression = use_compression
 
+    def data_type(self) -> Optional[DataType]:
+        return None
+
     @staticmethod
     def delete_none_entries(d: Dict) -> Dict:
         for key, value in list(d.items()):
@@ -219,20 +360,35 @@ class BaseDM:
         d["created_at"] = self.created_at.timestamp()
         return self.delete_none_entries(d)
 
+    @staticmethod
+    def _serialize_json(d: Dict) -> str:
+        return (FORMAT_TAG_JSON if EMIT_FORMAT_TAGS else "") + json.dumps(d)
+
     def serialize(self) -> str:
         d = self.dump()
         if self.use_compression:
             # try to use as little space as possible
             # first encode the dict into cbor2, then compress,
             # which helps especially for repetative data
-            # and then use base85 to (hopefully) use the space as best as possible
-            cbor_serialized = cbor2.dumps(d)
-            compressed_data = zlib.compress(cbor_serialized)
-            base64_encoded_data = base64.b85encode(compressed_data).decode()
-            logger.debug(f"{100*(1-len(compressed_data)/(1+len(cbor_serialized))):.1f}% compression")
-            return base64_encoded_data
+            # cbor2 streams directly into the compressor, such that
+            # the uncompressed cbor bytes are never materialized
+            # This cannot be left to websocket permessage-deflate: the relays only see
+            # the NIP-17 encrypted content, which is incompressible.
+            writer = ZlibWriter()
+            # cbor2 only calls write, so ZlibWriter does not implement the whole IO interface
+            cbor2.dump(d, cast(IO[bytes], writer))
+            if writer.bytes_written < MIN_COMPRESSION_SIZE:
+                # the compressor only buffered the data so far, flushing would do the actual work
+                return self._serialize_json(d)
+            compressed_data = writer.getvalue()
+            logger.debug(f"{100*(1-len(compressed_data)/(1+writer.bytes_written)):.1f}% compression")
+            if EMIT_FORMAT_TAGS:
+                # base64, because base85 is implemented in pure python and too slow for larger payloads
+                return FORMAT_TAG_ZLIB_CBOR_B64 + base64.b64encode(compressed_data).decode()
+            # the untagged legacy format
+            return base64.b85encode(compressed_data).decode()
         else:
-            return json.dumps(d)
+            return self._serialize_json(d)
 
     @classmethod
     def from_dump(cls, decoded_dict: Dict, network: bdk.Network):
@@ -249,31 +405,21 @@ class BaseDM:
                 days=30
             )  # assume the legacy format is at least 30 days old
 
-        logger.info(f" decoded_dict  {decoded_dict}")
+        logger.debug(" decoded_dict  %s", decoded_dict)
         return cls(**filtered_for_init(decoded_dict, cls))
 
     @classmethod
     def from_serialized(cls, base64_encoded_data: str, network: bdk.Network):
-        if base64_encoded_data.startswith("{"):
-            # if it is likely a json string, try this method first
-            try:
-                logger.debug(f"from_serialized json {base64_encoded_data}")
-                decoded_dict = json.loads(base64_encoded_data)
-                return cls.from_dump(decoded_dict, network=network)
-            except Exception:
-                pass
-                # logger.debug(f"from_serialized: json.loads failed with {base64_encoded_data},  {network}. Trying ")
-
+        decoder = FORMAT_DECODERS.get(base64_encoded_data[:2])
         try:
-            # try first the compressed decoding
-            logger.debug(f"from_serialized compressed {base64_encoded_data}")
-            decoded_data = base64.b85decode(base64_encoded_data)
-            decompressed_data = zlib.decompress(decoded_data)
-            decoded_dict = cbor2.loads(decompressed_data)
-            return cls.from_dump(decoded_dict, network=network)
+            if decoder:
+                decoded_dict = decoder(base64_encoded_data[2:])
+            else:
+                decoded_dict = decode_untagged(base64_encoded_data)
         except Exception:
-            logger.error(f"from_serialized failed with {base64_encoded_data} ")
+            logger.error(f"from_serialized failed to decode {len(base64_encoded_data)} characters")
             raise
+        return cls.from_dump(decoded_dict, network=network)
 
     def __str__(self) -> str:
         return str(self.dump())
@@ -282,14 +428,16 @@ class BaseDM:
         if isinstance(other, BaseDM):
             if bool(self.event) != bool(other.event):
                 return False
-            if self.event and other.event and self.event.as_json() != other.event.as_json():
-                # logger.debug(str((self.event.as_json(),  other.event.as_json())))
+            # events are content addressed, so comparing the ids is enough
+            if self.event and other.event and self.event.id() != other.event.id():
                 return False
             return True
         return False
 
 
 class ProtocolDM(BaseDM):
+    persist_in_dump = False
+
     def __init__(
         self,
         public_key_bech32: str,
@@ -354,6 +502,9 @@ class BitcoinDM(BaseDM):
         self.data = data
         self.intended_recipient = intended_recipient
 
+    def data_type(self) -> Optional[DataType]:
+        return self.data.data_type if self.data else None
+
     def dump(self) -> Dict:
         d = super().dump()
         d["label"] = self.label.value
@@ -408,26 +559,82 @@ class PrintHandler(HandleNotification):
         )
 
 
+class ProcessedDms:
+    "Ordered record of the processed dms, with a lookup by event id"
+
+    def __init__(self, dms: Iterable[BaseDM] = ()) -> None:
+        self.dms: deque[BaseDM] = deque()
+        self._by_event_id: Dict[Optional[EventId], List[BaseDM]] = {}
+        for dm in dms:
+            self.append(dm)
+
+    @staticmethod
+    def _key(dm: BaseDM) -> Optional[EventId]:
+        return dm.event.id() if dm.event else None
+
+    def append(self, dm: BaseDM):
+        self.dms.append(dm)
+        self._by_event_id.setdefault(self._key(dm), []).append(dm)
+
+    def remove(self, dm: BaseDM):
+        self.dms.remove(dm)
+        key = self._key(dm)
+        candidates = self._by_event_id.get(key, [])
+        if dm in candidates:
+            candidates.remove(dm)
+        if not candidates:
+            self._by_event_id.pop(key, None)
+
+    def __contains__(self, dm: object) -> bool:
+        if not isinstance(dm, BaseDM):
+            return False
+        # only dms with the same event id can be equal,
+        # the copy guards against appends from the asyncio thread
+        return dm in tuple(self._by_event_id.get(self._key(dm), ()))
+
+    def __iter__(self):
+        return iter(self.dms)
+
+    def __reversed__(self):
+        return reversed(self.dms)
+
+    def __len__(self) -> int:
+        return len(self.dms)
+
+
 class NotificationHandler(HandleNotification):
     def __init__(
         self,
         my_keys: Keys,
-        get_currently_allowed: Callable[[], set[str]],
-        processed_dms: deque[BaseDM],
+        get_currently_allowed: Callable[[], AbstractSet[str]],
+        processed_dms: ProcessedDms,
         signal_dm: pyqtBoundSignal,
         from_serialized: Callable[[str], BaseDM],
+        signal_dms: pyqtBoundSignal | None = None,
     ) -> None:
+        "signal_dms (optional) receives the replayed dms as one list"
         super().__init__()
-        self.processed_dms: deque[BaseDM] = processed_dms
-        self.untrusted_events: deque[Event] = deque(maxlen=10000)
+        self.processed_dms = processed_dms
+        # author bech32 -> events, the author with the most recent event last
+        self.untrusted_events: OrderedDict[str, deque[Event]] = OrderedDict()
+        # replay_events fills untrusted_events from the thread pool
+        self._untrusted_events_lock = threading.Lock()
         self.get_currently_allowed = get_currently_allowed
         self.my_keys = my_keys
+        # to_bech32 crosses into the rust bindings, so only do it once
+        self._my_public_key_bech32 = my_keys.public_key().to_bech32()
         self.signal_dm = signal_dm
+        self.signal_dms = signal_dms
         self.from_serialized = from_serialized
         signal_dm.connect(self.on_signal_dm)
 
-    def is_allowed_message(self, recipient_public_key: PublicKey, author: PublicKey) -> bool:
-        logger.debug(f"recipient_public_key = {recipient_public_key.to_bech32()}   ")
+    def is_allowed_message(
+        self,
+        recipient_public_key: PublicKey,
+        author: PublicKey,
+        currently_allowed: Optional[AbstractSet[str]] = None,
+    ) -> bool:
+        "currently_allowed (optional) is a snapshot of get_currently_allowed()"
         if not recipient_public_key:
             logger.debug("recipient_public_key not set")
             return False
@@ -435,27 +642,59 @@ class NotificationHandler(HandleNotification):
             logger.debug("author public_key not set")
             return False
 
-        if recipient_public_key.to_bech32() != self.my_keys.public_key().to_bech32():
+        debug = logger.isEnabledFor(logging.DEBUG)
+        recipient_bech32 = recipient_public_key.to_bech32()
+        if debug:
+            logger.debug(f"recipient_public_key = {recipient_bech32}   ")
+        if recipient_bech32 != self._my_public_key_bech32:
             logger.debug("dm is not for me")
             return False
 
-        if author.to_bech32() not in self.get_currently_allowed():
-            logger.debug(
-                f"author {author.to_bech32()} is not in get_currently_allowed {self.get_currently_allowed()}"
-            )
+        author_bech32 = author.to_bech32()
+        if currently_allowed is None:
+            currently_allowed = self.get_currently_allowed()
+        if author_bech32 not in currently_allowed:
+            if debug:
+                logger.debug(f"author {author_bech32} is not in get_currently_allowed {currently_allowed}")
             return False
 
-        logger.debug(f"valid dm: recipient {recipient_public_key.to_bech32()}, author {author.to_bech32()}")
+        if debug:
+            logger.debug(f"valid dm: recipient {recipient_bech32}, author {author_bech32}")
         return True
 
     async def handle(self, relay_url, subscription_id, event: Event):
-        logger.debug(f"Received new {event.kind().as_enum()} event from {relay_url}:   {event.as_json()}")
-        if event.kind().as_enum() == KindEnum.ENCRYPTED_DIRECT_MESSAGE():
+        nostr_dm = self.dm_from_event(event, relay_url=relay_url)
+        if nostr_dm:
+            self.emit_if_new(nostr_dm)
+
+    def dm_from_event(
+        self, event: Event, relay_url="", currently_allowed: Optional[AbstractSet[str]] = None
+    ) -> Optional[BaseDM]:
+        """Decrypts and deserializes the event. Returns None for untrusted or undecryptable events.
+
+        Pass currently_allowed, when calling this outside of the asyncio thread.
+        """
+        kind = event.kind().as_u16()
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            # as_json serializes the whole event in rust
+            logger.debug(f"Received new {kind} event from {relay_url}:   {event.as_json()}")
+        if kind == NIP04_DM_KIND_U16:
             try:
-                self.handle_nip04_event(event)
+                return self.handle_nip04_event(event, currently_allowed=currently_allowed)
             except Exception as e:
-                logger.debug(f"Error during content NIP04 decryption: {e}")
-        elif event.kind().as_enum() == KindEnum.GIFT_WRAP():
+                logger.debug("Error during content NIP04 decryption: %s", e)
+        elif kind == GIFT_WRAP_KIND_U16:
+            # the recipient tag is in the clear, so drop events for other
+            # recipients before paying for the decryption
+            recipient_public_keys = event.public_keys()
+            if (
+                not recipient_public_keys
+                or recipient_public_keys[0].to_bech32() != self._my_public_key_bech32
+            ):
+                logger.debug("gift wrap is not for me")
+                return None
+
             logger.debug("Decrypting NIP59 event")
             try:
                 # Extract rumor
@@ -464,62 +703,95 @@ class NotificationHandler(HandleNotification):
                 unwrapped_gift = UnwrappedGift.from_gift_wrap(self.my_keys, event)
                 sender = unwrapped_gift.sender()
 
-                recipient_public_key = event.public_keys()[0]
-                if not self.is_allowed_message(author=sender, recipient_public_key=recipient_public_key):
-                    self.untrusted_events.append(event)
-                    return
+                if not self.is_allowed_message(
+                    author=sender,
+                    recipient_public_key=recipient_public_keys[0],
+                    currently_allowed=currently_allowed,
+                ):
+                    self.add_untrusted_event(sender, event)
+                    return None
 
-                logger.debug(f"unwrapped_gift {unwrapped_gift} sender={sender}")
+                if debug:
+                    logger.debug(f"unwrapped_gift {unwrapped_gift} sender={sender}")
                 rumor: UnsignedEvent = unwrapped_gift.rumor()
 
                 # Check timestamp of rumor
-                if rumor.kind().as_enum() == KindEnum.PRIVATE_DIRECT_MESSAGE():
+                rumor_kind = rumor.kind()
+                if rumor_kind.as_u16() == DM_KIND_U16:
                     msg = rumor.content()
-                    logger.debug(f"Received new msg [sealed]: {msg}")
-                    self.handle_trusted_dm_for_me(event, sender, msg)
+                    if debug:
+                        logger.debug(f"Received new msg [sealed]: {msg}")
+                    return self.trusted_dm_for_me(event, sender, msg)
                 else:
-                    logger.error(f"Do not know how to handle {rumor.kind().as_enum()}.  {rumor.as_json()}")
+                    logger.error(f"Do not know how to handle {rumor_kind.as_enum()}.  {rumor.as_json()}")
             except Exception as e:
-                logger.debug(f"Error during content NIP59 decryption: {e}")
+                logger.debug("Error during content NIP59 decryption: %s", e)
+        return None
 
-    def handle_nip04_event(self, event: Event):
-        assert event.kind().as_enum() == KindEnum.ENCRYPTED_DIRECT_MESSAGE()
+    def handle_nip04_event(
+        self, event: Event, currently_allowed: Optional[AbstractSet[str]] = None
+    ) -> Optional[BaseDM]:
+        assert event.kind().as_u16() == NIP04_DM_KIND_U16
         recipient_public_key = get_recipient_public_key_of_nip04(event)
         if not recipient_public_key:
-            logger.debug(f"event {event.id()} doesnt contain a 04 tag and public key")
-            return
+            logger.debug("event %s doesnt contain a 04 tag and public key", event.id())
+            return None
 
-        if not self.is_allowed_message(recipient_public_key=recipient_public_key, author=event.author()):
-            self.untrusted_events.append(event)
-            return
+        if not self.is_allowed_message(
+            recipient_public_key=recipient_public_key,
+            author=event.author(),
+            currently_allowed=currently_allowed,
+        ):
+            self.add_untrusted_event(event.author(), event)
+            return None
 
         base64_encoded_data = nip04_decrypt(self.my_keys.secret_key(), event.author(), event.content())
         # logger.debug(f"Decrypted dm to: {base64_encoded_data}")
-        self.handle_trusted_dm_for_me(event, event.author(), base64_encoded_data)
+        return self.trusted_dm_for_me(event, event.author(), base64_encoded_data)
+
+    def add_untrusted_event(self, author: PublicKey, event: Event):
+        author_bech32 = author.to_bech32()
+        with self._untrusted_events_lock:
+            bucket = self.untrusted_events.get(author_bech32)
+            if bucket is None:
+                if len(self.untrusted_events) >= MAX_UNTRUSTED_AUTHORS:
+                    # forget the author that sent nothing for the longest time,
+                    # instead of the one seen first (typically the device waiting to be trusted)
+                    self.untrusted_events.popitem(last=False)
+                bucket = self.untrusted_events.setdefault(
+                    author_bech32, deque(maxlen=UNTRUSTED_EVENTS_PER_AUTHOR)
+                )
+            else:
+                self.untrusted_events.move_to_end(author_bech32)
+            bucket.append(event)
 
-    def handle_trusted_dm_for_me(self, event: Event, author: PublicKey, base64_encoded_data: str):
+    def pop_untrusted_events(self, author_bech32: str) -> List[Event]:
+        "Removes and returns the untrusted events of author_bech32"
+        with self._untrusted_events_lock:
+            return list(self.untrusted_events.pop(author_bech32, ()))
+
+    def trusted_dm_for_me(self, event: Event, author: PublicKey, base64_encoded_data: str) -> BaseDM:
         nostr_dm: BaseDM = self.from_serialized(base64_encoded_data)
         nostr_dm.event = event
         nostr_dm.author = author
+        return nostr_dm
 
+    def emit_if_new(self, nostr_dm: BaseDM):
         if self.dm_is_alreay_processed(nostr_dm):
-            logger.debug(f"This nostr dm is already in the processed_dms")
+            logger.debug("This nostr dm is already in the processed_dms")
             return
 
         self.signal_dm.emit(nostr_dm)
 
-        logger.debug(f"Processed dm: {nostr_dm}")
+        logger.debug("Processed dm: %s", nostr_dm)
 
     def on_signal_dm(self, dm: BaseDM):
-        self.processed_dms.append(dm)
+        # replayed dms were appended already by emit_replayed
+        if dm not in self.processed_dms:
+            self.processed_dms.append(dm)
 
     def dm_is_alreay_processed(self, dm: BaseDM) -> bool:
-        for item in list(self.processed_dms):
-            if not isinstance(item, BaseDM):
-                continue  # type: ignore
-            if item == dm:
-                return True
-        return False
+        return dm in self.processed_dms
 
     async def handle_msg(self, relay_url: str, msg: RelayMessage):
         # logger.debug(f"handle_msg {relay_url}: {msg}")
@@ -529,38 +801,107 @@ class NotificationHandler(HandleNotification):
         self, events: Iterable[Event], relay_url="from_storage", subscription_id="replay"
     ):
         # now handle the dms_from_dump as if they came from a relay
-        for event in events:
-            await self.handle(relay_url=relay_url, event=event, subscription_id=subscription_id)
+        # The decryption and signature checks run in rust without the GIL, so they are
+        # spread over the thread pool. The dms are emitted in the original order.
+        loop = asyncio.get_running_loop()
+        # get_currently_allowed may rebuild its cache, so call it only here and not in the pool
+        currently_allowed = self.get_currently_allowed()
+        nostr_dms = await asyncio.gather(
+            *[
+                loop.run_in_executor(_DUMP_EXECUTOR, self.dm_from_event, event, relay_url, currently_allowed)
+                for event in events
+            ]
+        )
+        self.emit_replayed(nostr_dms)
+
+    async def replay_dms(self, dms: Iterable[BaseDM], relay_url="from_storage"):
+        """Replays dms that were restored from a dump.
+
+        The dump already holds the decrypted dms, so only the dms whose author is
+        not trusted (anymore) or that were not addressed to my current key are
+        decrypted again, such that they end up in the untrusted events.
+        """
+        loop = asyncio.get_running_loop()
+        currently_allowed = self.get_currently_allowed()
+        futures: List[asyncio.Future[Optional[BaseDM]]] = []
+        for dm in dms:
+            if not dm.event:
+                continue
+            if self._snapshot_is_valid(dm, currently_allowed):
+                future: asyncio.Future[Optional[BaseDM]] = loop.create_future()
+                future.set_result(dm)
+            else:
+                future = loop.run_in_executor(
+                    _DUMP_EXECUTOR, self.dm_from_event, dm.event, relay_url, currently_allowed
+                )
+            futures.append(future)
+        self.emit_replayed(await asyncio.gather(*futures))
 
-    async def replay_untrusted_events(self):
-        await self.replay_events([event for event in self.untrusted_events])
+    def _snapshot_is_valid(self, dm: BaseDM, currently_allowed: AbstractSet[str]) -> bool:
+        if not dm.event or not dm.author or dm.author.to_bech32() not in currently_allowed:
+            return False
+        recipient_public_keys = dm.event.public_keys()
+        return (
+            bool(recipient_public_keys) and recipient_public_keys[0].to_bech32() == self._my_public_key_bech32
+        )
+
+    def emit_replayed(self, nostr_dms: Iterable[Optional[BaseDM]]):
+        if self.signal_dms is None:
+            for nostr_dm in nostr_dms:
+                if nostr_dm:
+                    self.emit_if_new(nostr_dm)
+            return
+
+        # a single queued signal into the main thread, instead of one per dm.
+        # The main thread re-emits them on signal_dm, but on_signal_dm may be connected in this
+        # thread (see refresh_client), which runs no qt event loop. So append them here.
+        new_dms: List[BaseDM] = []
+        for nostr_dm in nostr_dms:
+            if nostr_dm and not self.dm_is_alreay_processed(nostr_dm):
+                self.processed_dms.append(nostr_dm)
+                new_dms.append(nostr_dm)
+        if new_dms:
+            self.signal_dms.emit(new_dms)
+
+    async def replay_untrusted_events(self, author_bech32: str):
+        # only the events of this author can have become trusted.
+        # The bucket is taken out before replaying, so a repeated trust action
+        # finds it empty instead of replaying the events twice
+        await self.replay_events(self.pop_untrusted_events(author_bech32))
 
 
 class AsyncDmConnection(QObject):
+    signal_dms = pyqtSignal(list)
+
     def __init__(
         self,
         signal_dm: pyqtBoundSignal,
         from_serialized: Callable[[str], BaseDM],
         keys: Keys,
-        get_currently_allowed: Callable[[], Set[str]],
+        get_currently_allowed: Callable[[], AbstractSet[str]],
         use_timer: bool = False,
         dms_from_dump: Iterable[BaseDM] | None = None,
         relay_list: RelayList | None = None,
     ) -> None:
         super().__init__()
         self.signal_dm = signal_dm
+        # batches from replay_events are emitted as single dms again in the main thread
+        self.signal_dms.connect(self.on_signal_dms)
         self.use_timer = use_timer
         self.get_currently_allowed = get_currently_allowed
         self.from_serialized = from_serialized
         self.minimum_connect_relays = 8
         self.relay_list = relay_list if relay_list else RelayList.from_internet()
         self.counter_no_connected_relay = 0
+        self._connect_attempted = False
 
-        self.keys: Keys = keys
+        self.keys = keys
 
         # self.dms_from_dump is used for replaying events from dump
         self.dms_from_dump: deque[BaseDM] = deque(dms_from_dump) if dms_from_dump else deque()
         self.current_subscription_dict: Dict[str, PublicKey] = {}  # subscription_id: PublicKey
+        # filters without since, only the start time changes between subscriptions
+        self._filter_cache: Dict[PublicKey, Filter] = {}
         self.timer = QTimer()
 
         signer = NostrSigner.keys(self.keys)
@@ -568,12 +909,30 @@ class AsyncDmConnection(QObject):
 
         self.notification_handler = NotificationHandler(
             my_keys=self.keys,
-            processed_dms=deque(),  # do  not set here the dms_from_dump, otherwise the replaying messages are all ignored
+            processed_dms=ProcessedDms(),  # do  not set here the dms_from_dump, otherwise the replaying messages are all ignored
             signal_dm=self.signal_dm,
             get_currently_allowed=self.get_currently_allowed,
             from_serialized=self.from_serialized,
+            signal_dms=self.signal_dms,
         )
 
+    def on_signal_dms(self, dms: List[BaseDM]):
+        for dm in dms:
+            self.signal_dm.emit(dm)
+
+    @property
+    def keys(self) -> Keys:
+        return self._keys
+
+    @keys.setter
+    def keys(self, keys: Keys):
+        self._keys = keys
+        # keys.public_key() crosses into the rust bindings and allocates a new PublicKey
+        self._own_public_key = keys.public_key()
+
+    def own_public_key(self) -> PublicKey:
+        return self._own_public_key
+
     async def init_client(self):
         return await self.refresh_client()
 
@@ -594,40 +953,101 @@ class AsyncDmConnection(QObject):
             signal_dm=self.signal_dm,
             get_currently_allowed=self.get_currently_allowed,
             from_serialized=self.from_serialized,
+            signal_dms=self.signal_dms,
         )
         await self.client.handle_notifications(self.notification_handler)
 
+    async def update_relay_list(self, relay_list: RelayList):
+        "Keeps the client and the connections to relays, that are also in the subset of the new relay_list"
+        self.relay_list = relay_list
+        if not self.client:
+            await self.refresh_client()
+            if not self.client:
+                return
+
+        # connect to the same subset as ensure_connected would, such that a reordered list
+        # (e.g. an own relay put first) is connected, even while enough old relays are connected
+        relay_subset = relay_list.get_subset(self.minimum_connect_relays + self.counter_no_connected_relay)
+        # the client normalizes the urls with a trailing /
+        wanted_relays = {url.rstrip("/") for url in relay_subset}
+        for url in await self.client.relays():
+            if url.rstrip("/") not in wanted_relays:
+                await self.client.remove_relay(url)
+        await self.client.add_relays(relay_subset)
+        # connect() does not wait for the connections, the relay pool completes them in the background
+        await self.client.connect()
+        self._connect_attempted = True
+        logger.debug("update_relay_list connects to %s", relay_subset)
+
     def public_key_was_published(self, public_key: PublicKey) -> bool:
-        for dm in list(self.notification_handler.processed_dms):
+        public_key_bech32 = public_key.to_bech32()
+        # snapshot, since processed_dms is appended in the asyncio thread
+        for dm in reversed(tuple(self.notification_handler.processed_dms)):
             if isinstance(dm, ProtocolDM):
-                if dm.public_key_bech32 == public_key.to_bech32():
+                if dm.public_key_bech32 == public_key_bech32:
                     return True
         return False
 
-    async def get_connected_relays(self) -> List[Relay]:
-
+    async def iter_connected_relays(self) -> AsyncIterator[Relay]:
         relays = await self.client.relays()
-        connected_relays: List[Relay] = [
-            relay for relay in relays.values() if await relay.status() == RelayStatus.CONNECTED
-        ]
-        logger.debug(f"connected_relays = {connected_relays} of all relays {relays}")
+        for relay in relays.values():
+            if await relay.status() == RELAY_STATUS_CONNECTED:
+                yield relay
+
+    async def get_connected_relays(self) -> List[Relay]:
+        connected_relays: List[Relay] = [relay async for relay in self.iter_connected_relays()]
+        logger.debug(f"connected_relays = {connected_relays}")
         return connected_relays
 
+    async def has_connected_relays(self, minimum: int = 1) -> bool:
+        "Stops querying the relay status, as soon as minimum connected relays are found"
+        if minimum <= 0:
+            return True
+        count = 0
+        async for _ in self.iter_connected_relays():
+            count += 1
+            if count >= minimum:
+                return True
+        return False
+
     async def send(self, dm: BaseDM, receiver: PublicKey) -> Optional[EventId]:
+        await self.ensure_connected()
+        return await self._send(dm, receiver)
+
+    async def send_to_many(self, dm: BaseDM, receivers: List[PublicKey]) -> List[Optional[EventId]]:
+        "Sends the same dm to all receivers concurrently. The payload is serialized only once."
         await self.ensure_connected()
         try:
             serialized_dm = dm.serialize()
+        except Exception as e:
+            logger.error(f"Error serializing direct message: {e}")
+            return [None] * len(receivers)
+        return await asyncio.gather(
+            *[self._send(dm, receiver, serialized_dm=serialized_dm) for receiver in receivers]
+        )
+
+    async def send_many(self, dms: Iterable[Tuple[BaseDM, PublicKey]]) -> List[Optional[EventId]]:
+        "Ensures the connection once and then sends all (dm, receiver) pairs concurrently"
+        await self.ensure_connected()
+        return await asyncio.gather(*[self._send(dm, receiver) for dm, receiver in dms])
+
+    async def _send(
+        self, dm: BaseDM, receiver: PublicKey, serialized_dm: str | None = None
+    ) -> Optional[EventId]:
+        try:
+            if serialized_dm is None:
+                serialized_dm = dm.serialize()
             event_id = await self.client.send_private_msg(receiver, serialized_dm, reply_to=None)
-            logger.debug(f"sent {dm} with {len(serialized_dm)} characters")
+            logger.debug("sent %s with %s characters", dm, len(serialized_dm))
             return event_id
         except Exception as e:
             logger.error(f"Error sending direct message: {e}")
             return None
 
     def _get_filters(self, recipient: PublicKey, start_time: datetime | None = None) -> List[Filter]:
-        this_filter = (
-            Filter().pubkey(recipient).kinds([Kind.from_enum(DM_KIND), Kind.from_enum(KindEnum.GIFT_WRAP())])
-        )
+        this_filter = self._filter_cache.get(recipient)
+        if this_filter is None:
+            this_filter = self._filter_cache[recipient] = Filter().pubkey(recipient).kinds(SUBSCRIBED_KINDS)
 
         if start_time:
             timestamp = Timestamp.from_secs(int(start_time.timestamp()))
@@ -638,27 +1058,36 @@ class AsyncDmConnection(QObject):
 
     async def subscribe(self, start_time: datetime | None = None) -> str:
         "overwrites previous filters"
-        if not await self.get_connected_relays():
-            await self.ensure_connected()
+        if not await self.has_connected_relays():
+            await self.ensure_connected(known_disconnected=True)
 
         self._start_timer()
 
-        filters = self._get_filters(self.keys.public_key(), start_time=start_time)
+        public_key = self.own_public_key()
+        filters = self._get_filters(public_key, start_time=start_time)
         logger.debug(f"Subscribe to {filters}")
-        subscription_id = await self.client.subscribe(filters, opts=None)
-
-        self.current_subscription_dict[subscription_id] = self.keys.public_key()
-        logger.debug(
-            f"Added subscription_id {subscription_id} for public_key {self.keys.public_key().to_bech32()}"
+        # reuse the subscription id of an earlier subscription to the same key,
+        # such that the relays replace the REQ instead of matching the events twice
+        subscription_id = next(
+            (sub_id for sub_id, pub_key in self.current_subscription_dict.items() if pub_key == public_key),
+            None,
         )
+        if subscription_id is None:
+            subscription_id = await self.client.subscribe(filters, opts=None)
+        else:
+            await self.client.subscribe_with_id(subscription_id, filters, opts=None)
+
+        self.current_subscription_dict[subscription_id] = public_key
+        logger.debug(f"Added subscription_id {subscription_id} for public_key {public_key.to_bech32()}")
         return subscription_id
 
     async def unsubscribe_all(self):
         await self.unsubscribe(list(self.current_subscription_dict.values()))
 
     async def unsubscribe(self, public_keys: List[PublicKey]):
+        unsubscribe_keys = set(public_keys)
         for subscription_id, pub_key in list(self.current_subscription_dict.items()):
-            if pub_key in public_keys:
+            if pub_key in unsubscribe_keys:
                 await self.client.unsubscribe(subscription_id)
                 del self.current_subscription_dict[subscription_id]
 
@@ -674,9 +1103,10 @@ class AsyncDmConnection(QObject):
     def _timer_ensure_connected(self):
         asyncio.create_task(self.ensure_connected())
 
-    async def ensure_connected(self):
-        if len(await self.get_connected_relays()) >= min(
-            self.minimum_connect_relays, len(self.relay_list.relays)
+    async def ensure_connected(self, known_disconnected=False):
+        "known_disconnected skips querying the relay status, if the caller just did that"
+        if not known_disconnected and await self.has_connected_relays(
+            min(self.minimum_connect_relays, len(self.relay_list.relays))
         ):
             return
 
@@ -687,42 +1117,39 @@ class AsyncDmConnection(QObject):
 
         self.relay_list.update_if_stale()
 
+        if self._connect_attempted:
+            # the previous attempt did not reach enough relays, so try 1 more connection
+            self.counter_no_connected_relay += 1
+        self._connect_attempted = True
+
         relay_subset = self.relay_list.get_subset(
             self.minimum_connect_relays + self.counter_no_connected_relay
         )
         await self.client.add_relays(relay_subset)
+        # connect() does not wait for the connections, the relay pool completes them in the background
         await self.client.connect()
-        logger.debug(
-            f"add_relay {relay_subset}, currently get_connected_relays={await self.get_connected_relays()}"
-        )
-        # assume the connections are successfull
-        # however if not, then next time try 1 more connection
-        # sleep(0.1)
-        self.counter_no_connected_relay += 1
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"add_relay {relay_subset}, currently get_connected_relays={await self.get_connected_relays()}"
+            )
 
     def dump(
         self,
-        forbidden_data_types: List[DataType] | None = None,
+        forbidden_data_types: Iterable[DataType] | None = None,
     ):
-        def include_item(item: BaseDM) -> bool:
-            if isinstance(item, BitcoinDM):
-                if forbidden_data_types is not None:
-                    if item.data and item.data.data_type in forbidden_data_types:
-                        return False
-            if isinstance(item, ProtocolDM):
-                return False
-            return True
-
+        forbidden = frozenset(forbidden_data_types or ())
         return {
             "use_timer": self.use_timer,
             "keys": self.keys.secret_key().to_bech32(),
             "dms_from_dump": [
-                item.dump() for item in self.notification_handler.processed_dms if item and include_item(item)
+                item.dump()
+                for item in self.notification_handler.processed_dms
+                if item and item.persist_in_dump and item.data_type() not in forbidden
             ],
             # TODO: This might be added in the future,
             # to allow restoring labels from devices that are connected after the wallet has been shut down
             # "untrusted_events": [
-            #     item.dump() for item in self.notification_handler.untrusted_events if item and include_item(item)
+            #     item.dump() for item in self.notification_handler.untrusted_events if item and item.persist_in_dump
             # ],
             "relay_list": self.relay_list.dump(),
         }
@@ -733,12 +1160,16 @@ class AsyncDmConnection(QObject):
         d: Dict,
         signal_dm: pyqtBoundSignal,
         from_serialized: Callable[[str], BaseDM],
-        get_currently_allowed: Callable[[], Set[str]],
+        get_currently_allowed: Callable[[], AbstractSet[str]],
         network: bdk.Network,
     ) -> "AsyncDmConnection":
         d["keys"] = Keys(secret_key=SecretKey.from_bech32(d["keys"]))
 
-        d["dms_from_dump"] = [BitcoinDM.from_dump(d, network=network) for d in d.get("dms_from_dump", [])]
+        d["dms_from_dump"] = list(
+            _DUMP_EXECUTOR.map(
+                lambda item: BitcoinDM.from_dump(item, network=network), d.get("dms_from_dump", [])
+            )
+        )
         d["relay_list"] = RelayList.from_dump(d["relay_list"]) if "relay_list" in d else None
 
         return cls(
@@ -750,7 +1181,7 @@ class AsyncDmConnection(QObject):
 
     async def replay_events_from_dump(self):
         # now handle the dms_from_dump as if they came from a relay
-        await self.notification_handler.replay_events([dm.event for dm in self.dms_from_dump if dm.event])
+        await self.notification_handler.replay_dms(self.dms_from_dump)
 
 
 class AsyncThread(QThread):
@@ -834,7 +1265,7 @@ class DmConnection(QObject):
         signal_dm: pyqtBoundSignal,
         from_serialized: Callable[[str], BaseDM],
         keys: Keys,
-        get_currently_allowed: Callable[[], Set[str]],
+        get_currently_allowed: Callable[[], AbstractSet[str]],
         use_timer: bool = False,
         dms_from_dump: deque[BitcoinDM] | None = None,
         relay_list: RelayList | None = None,
@@ -874,7 +1305,7 @@ class DmConnection(QObject):
         d: Dict,
         signal_dm: pyqtBoundSignal,
         from_serialized: Callable[[str], BaseDM],
-        get_currently_allowed: Callable[[], Set[str]],
+        get_currently_allowed: Callable[[], AbstractSet[str]],
         network: bdk.Network,
         parent: QObject | None = None,
     ) -> "DmConnection":
@@ -896,15 +1327,35 @@ class DmConnection(QObject):
 
     def dump(
         self,
-        forbidden_data_types: List[DataType] | None = None,
+        forbidden_data_types: Iterable[DataType] | None = None,
     ):
         return self.async_dm_connection.dump(forbidden_data_types=forbidden_data_types)
 
     def send(
-        self, dm: BaseDM, receiver: PublicKey, on_done: Callable[[Optional[EventId]], None] | None = None
+        self,
+        dm: BaseDM,
+        receiver: PublicKey,
+        on_done: Callable[[Optional[EventId]], None] | None = None,
     ):
         self.async_thread.run_coroutine(self.async_dm_connection.send(dm, receiver), on_done=on_done)
 
+    def send_to_many(
+        self,
+        dm: BaseDM,
+        receivers: List[PublicKey],
+        on_done: Callable[[List[Optional[EventId]]], None] | None = None,
+    ):
+        self.async_thread.run_coroutine(
+            self.async_dm_connection.send_to_many(dm, list(receivers)), on_done=on_done
+        )
+
+    def send_many(
+        self,
+        dms: Iterable[Tuple[BaseDM, PublicKey]],
+        on_done: Callable[[List[Optional[EventId]]], None] | None = None,
+    ):
+        self.async_thread.run_coroutine(self.async_dm_connection.send_many(list(dms)), on_done=on_done)
+
     def get_connected_relays(self) -> List[Relay]:
         return self.async_thread.run_coroutine_blocking(self.async_dm_connection.get_connected_relays())
 
@@ -917,6 +1368,11 @@ class DmConnection(QObject):
     def refresh_client(self, on_done: Callable[[], None] | None = None):
         self.async_thread.run_coroutine(self.async_dm_connection.refresh_client(), on_done=on_done)
 
+    def update_relay_list(self, relay_list: RelayList, on_done: Callable[[], None] | None = None):
+        self.async_thread.run_coroutine(
+            self.async_dm_connection.update_relay_list(relay_list), on_done=on_done
+        )
+
     def subscribe(self, start_time: datetime | None = None, on_done: Callable[[str], None] | None = None):
         self.async_thread.run_coroutine(self.async_dm_connection.subscribe(start_time), on_done=on_done)
 
@@ -952,6 +1408,8 @@ class BaseProtocol(QObject):
         # start_time saves the last shutdown time
         self.sync_start = sync_start
         self.network = network
+        self._currently_allowed: FrozenSet[str] | None = None
+        self._currently_allowed_version = 0
 
         self.dm_connection = (
             DmConnection.from_dump(
@@ -973,7 +1431,7 @@ class BaseProtocol(QObject):
         )
 
     def my_public_key(self) -> PublicKey:
-        return self.dm_connection.async_dm_connection.keys.public_key()
+        return self.dm_connection.async_dm_connection.own_public_key()
 
     @abstractmethod
     def subscribe(self):
@@ -987,20 +1445,40 @@ class BaseProtocol(QObject):
         keys = keys if keys else self.dm_connection.async_dm_connection.keys
         relay_list = relay_list if relay_list else self.dm_connection.async_dm_connection.relay_list
 
-        self.dm_connection.disconnect()
-        self.dm_connection.async_dm_connection.keys = keys
-        self.dm_connection.async_dm_connection.relay_list = relay_list
         # prevent redownloading the messages by setting the time to now
         self.sync_start = datetime.now()
-        self.dm_connection.refresh_client()
+        if keys.public_key() == self.my_public_key():
+            # the client and its relay connections can be kept, only the relays are diffed
+            self.dm_connection.update_relay_list(relay_list)
+        else:
+            self.dm_connection.disconnect()
+            self.dm_connection.async_dm_connection.keys = keys
+            self.dm_connection.async_dm_connection.relay_list = relay_list
+            self.invalidate_currently_allowed()
+            self.dm_connection.refresh_client()
 
         self.subscribe()
 
     def set_relay_list(self, relay_list: RelayList):
         self.refresh_dm_connection(relay_list=relay_list)
 
+    def get_currently_allowed(self) -> FrozenSet[str]:
+        "Is called for every incoming event, so the result is cached until invalidate_currently_allowed"
+        currently_allowed = self._currently_allowed
+        if currently_allowed is None:
+            version = self._currently_allowed_version
+            currently_allowed = frozenset(self.compute_currently_allowed())
+            # do not cache the result, if it was invalidated (by the main thread) in the meantime
+            if version == self._currently_allowed_version:
+                self._currently_allowed = currently_allowed
+        return currently_allowed
+
+    def invalidate_currently_allowed(self):
+        self._currently_allowed_version += 1
+        self._currently_allowed = None
+
     @abstractmethod
-    def get_currently_allowed(self) -> Set[str]:
+    def compute_currently_allowed(self) -> Set[str]:
         pass
 
 
@@ -1026,8 +1504,8 @@ class NostrProtocol(BaseProtocol):
         )
         self.use_compression = use_compression
 
-    def get_currently_allowed(self) -> Set[str]:
-        return set([self.my_public_key().to_bech32()])
+    def compute_currently_allowed(self) -> Set[str]:
+        return {self.my_public_key().to_bech32()}
 
     def from_serialized(self, base64_encoded_data) -> ProtocolDM:
         return ProtocolDM.from_serialized(base64_encoded_data=base64_encoded_data, network=self.network)
@@ -1050,14 +1528,30 @@ class NostrProtocol(BaseProtocol):
         logger.debug(f"done publish_public_key {self.my_public_key().to_bech32()}")
 
     def publish_trust_me_back(self, author_public_key: PublicKey, recipient_public_key: PublicKey):
-        dm = ProtocolDM(
-            public_key_bech32=author_public_key.to_bech32(),
-            please_trust_public_key_bech32=recipient_public_key.to_bech32(),
-            event=None,
-            use_compression=self.use_compression,
-            created_at=datetime.now(),
-        )
-        self.dm_connection.send(dm, self.my_public_key())
+        self.publish_trust_me_back_batch(author_public_key, [recipient_public_key])
+
+    def publish_trust_me_back_batch(
+        self, author_public_key: PublicKey, recipient_public_keys: Iterable[PublicKey]
+    ):
+        "Sends all trust requests in one coroutine, instead of one cross thread call per recipient"
+        author_bech32 = author_public_key.to_bech32()
+        my_public_key = self.my_public_key()
+        created_at = datetime.now()
+        dms = [
+            (
+                ProtocolDM(
+                    public_key_bech32=author_bech32,
+                    please_trust_public_key_bech32=recipient_public_key.to_bech32(),
+                    event=None,
+                    use_compression=self.use_compression,
+                    created_at=created_at,
+                ),
+                my_public_key,
+            )
+            for recipient_public_key in recipient_public_keys
+        ]
+        if dms:
+            self.dm_connection.send_many(dms)
 
     def subscribe(self):
         def on_done(subscription_id: str):
@@ -1100,6 +1594,10 @@ class GroupChat(BaseProtocol):
     ) -> None:
         "Either keys or dm_connection_dump must be given"
         self.members: List[PublicKey] = members if members else []
+        # bech32 -> member, a side index of self.members, that is rebuilt by _member_index
+        self._members_index: Dict[str, PublicKey] = {}
+        self._indexed_members: List[PublicKey] | None = None
+        self._indexed_members_len = 0
         self.use_compression = use_compression
         self.nip17_time_uncertainty = timedelta(
             days=2
@@ -1112,25 +1610,56 @@ class GroupChat(BaseProtocol):
             network=network,
         )
 
-    def get_currently_allowed(self) -> Set[str]:
-        return set([member.to_bech32() for member in self.members_including_me()])
+    def _member_index(self) -> Dict[str, PublicKey]:
+        """Returns the bech32 index of self.members.
+
+        members is a public list, so the index is also rebuilt if the list was replaced,
+        or grew or shrunk without add_member/remove_member.
+        """
+        if self._indexed_members is not self.members or self._indexed_members_len != len(self.members):
+            self._members_index = {member.to_bech32(): member for member in self.members}
+            self._indexed_members = self.members
+            self._indexed_members_len = len(self.members)
+            self.invalidate_currently_allowed()
+        return self._members_index
+
+    def get_currently_allowed(self) -> FrozenSet[str]:
+        self._member_index()
+        return super().get_currently_allowed()
+
+    def is_member(self, public_key_bech32: str) -> bool:
+        return public_key_bech32 in self._member_index()
+
+    def compute_currently_allowed(self) -> Set[str]:
+        # the members are already keyed by their bech32
+        return {*self._member_index(), self.my_public_key().to_bech32()}
 
     def from_serialized(self, base64_encoded_data: str) -> BitcoinDM:
         return BitcoinDM.from_serialized(base64_encoded_data, network=self.network)
 
     def add_member(self, new_member: PublicKey):
-        if new_member.to_bech32() not in [k.to_bech32() for k in self.members]:
+        new_member_bech32 = new_member.to_bech32()
+        members_index = self._member_index()
+        if new_member_bech32 not in members_index:
             self.members.append(new_member)
+            members_index[new_member_bech32] = new_member
+            self._indexed_members_len = len(self.members)
+            self.invalidate_currently_allowed()
             # because NIP17, i only need to watch stuff that goes to me, no matter from whom
             # self.dm_connection.subscribe( new_member)
-            logger.debug(f"Add {new_member.to_bech32()} as trusted")
+            logger.debug(f"Add {new_member_bech32} as trusted")
 
     def remove_member(self, remove_member: PublicKey):
-        members_bech32 = [k.to_bech32() for k in self.members]
-        if remove_member.to_bech32() in members_bech32:
-            self.members.pop(members_bech32.index(remove_member.to_bech32()))
+        remove_member_bech32 = remove_member.to_bech32()
+        if self._member_index().pop(remove_member_bech32, None) is not None:
+            # in place, such that references to the members list stay valid
+            self.members[:] = [
+                member for member in self.members if member.to_bech32() != remove_member_bech32
+            ]
+            self._indexed_members_len = len(self.members)
+            self.invalidate_currently_allowed()
             self.dm_connection.unsubscribe([remove_member])
-            logger.debug(f"Removed {remove_member.to_bech32()}")
+            logger.debug(f"Removed {remove_member_bech32}")
 
     def _send_copy_to_myself(self, dm: BitcoinDM, receiver: PublicKey, send_to_other_event_id: EventId):
         logger.debug(
@@ -1141,14 +1670,25 @@ class GroupChat(BaseProtocol):
         self.dm_connection.send(copy_dm, receiver=self.my_public_key())
 
     def send_to(self, dm: BitcoinDM, recipients: List[PublicKey], send_also_to_me=True):
-        for public_key in recipients:
+        recipients = list(recipients)
+        if recipients:
             on_done = None
-            if send_also_to_me and public_key == self.members[-1]:
-                # for the last recipient, make a callback to send a copy to myself
-                # such that, if the last recipient gets it, then i get a copy too
-                on_done = lambda event_id: self._send_copy_to_myself(dm, public_key, event_id)
-            self.dm_connection.send(dm, public_key, on_done=on_done)
-            logger.debug(f"Send to {public_key.to_bech32()}")
+            last_member = self.members[-1] if self.members else None
+            index = next((i for i, public_key in enumerate(recipients) if public_key == last_member), None)
+            if send_also_to_me and index is not None:
+                # make a callback to send a copy to myself
+                # such that, if the last member gets it, then i get a copy too
+                def on_done(event_ids: List[Optional[EventId]] | Exception):
+                    if isinstance(event_ids, Exception):
+                        # run_coroutine passes exceptions of the coroutine to the callback
+                        logger.error(f"Error sending direct message: {event_ids}")
+                        return
+                    self._send_copy_to_myself(dm, recipients[index], event_ids[index])
+
+            # the payload is identical for all recipients, only the encryption differs,
+            # so it is serialized once (in the async thread)
+            self.dm_connection.send_to_many(dm, recipients, on_done=on_done)
+            logger.debug("Send to %s recipients", len(recipients))
 
         if not self.members:
             logger.debug(f"{self.members=}, so sending to myself only")
@@ -1157,7 +1697,7 @@ class GroupChat(BaseProtocol):
     def send(self, dm: BitcoinDM, send_also_to_me=True):
         self.send_to(dm=dm, recipients=self.members, send_also_to_me=send_also_to_me)
 
-    def members_including_me(self):
+    def members_including_me(self) -> List[PublicKey]:
         return self.members + [self.my_public_key()]
 
     def subscribe(self):
@@ -1168,13 +1708,13 @@ class GroupChat(BaseProtocol):
         self.dm_connection.subscribe(start_time=start_time, on_done=on_done)
 
     def dump(self):
-        forbidden_data_types = [DataType.LabelsBip329]
+        forbidden_data_types = frozenset([DataType.LabelsBip329])
         return {
             # start_time saves the last shutdown time
             # the next start_time is the current time
             "sync_start": datetime.now().timestamp(),
             "dm_connection_dump": self.dm_connection.dump(forbidden_data_types=forbidden_data_types),
-            "members": [member.to_bech32() for member in self.members],
+            "members": list(self._member_index()),
             "use_compression": self.use_compression,
             "network": self.network.name,
         }
@@ -28,10 +28,16 @@
 
 
 import logging
+import time
 from datetime import datetime
 
 from bitcoin_nostr_chat import DEFAULT_USE_COMPRESSION
-from bitcoin_nostr_chat.dialogs import SecretKeyDialog, create_custom_message_box
+from bitcoin_nostr_chat.dialogs import (  # noqa: F401 file_to_str, is_binary are re-exported
+    SecretKeyDialog,
+    create_custom_message_box,
+    file_to_str,
+    is_binary,
+)
 from bitcoin_nostr_chat.label_connector import LabelConnector
 from bitcoin_nostr_chat.nostr import GroupChat, NostrProtocol
 from bitcoin_nostr_chat.signals_min import SignalsMin
@@ -41,7 +47,7 @@ from bitcoin_nostr_chat.utils import filtered_for_init
 from .signals_min import SignalsMin
 
 logger = logging.getLogger(__name__)
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
 
 import bdkpython as bdk
 from bitcoin_qr_tools.data import Data, DataType
@@ -63,30 +69,7 @@ from .nostr import (
 )
 from .ui.ui import UI, TrustedDevice, UnTrustedDevice
 
-
-def is_binary(file_path: str):
-    """Check if a file is binary or text.
-
-    Returns True if binary, False if text.
-    """
-    try:
-        with open(file_path, "r") as f:
-            for chunk in iter(lambda: f.read(1024), ""):
-                if "\0" in chunk:  # found null byte
-                    return True
-    except UnicodeDecodeError:
-        return True
-
-    return False
-
-
-def file_to_str(file_path: str):
-    if is_binary(file_path):
-        with open(file_path, "rb") as f:
-            return bytes(f.read()).hex()
-    else:
-        with open(file_path, "r") as f:
-            return f.read()
+CONNECTED_RELAYS_TTL = 1.0  # seconds
 
 
 class BaseNostrSync(QObject):
@@ -100,7 +83,7 @@ class BaseNostrSync(QObject):
         group_chat: GroupChat,
         signals_min: SignalsMin,
         individual_chats_visible=True,
-        hide_data_types_in_chat: tuple[DataType] = (DataType.LabelsBip329,),
+        hide_data_types_in_chat: Iterable[DataType] | None = None,
         use_compression=DEFAULT_USE_COMPRESSION,
         debug=False,
         parent: QObject | None = None,
@@ -110,9 +93,20 @@ class BaseNostrSync(QObject):
         self.debug = debug
         self.nostr_protocol = nostr_protocol
         self.group_chat = group_chat
-        self.hide_data_types_in_chat = hide_data_types_in_chat
+        self.hide_data_types_in_chat: FrozenSet[DataType] = (
+            frozenset(hide_data_types_in_chat)
+            if hide_data_types_in_chat is not None
+            else frozenset([DataType.LabelsBip329])
+        )
         self.signals_min = signals_min
         self.use_compression = use_compression
+        self._connected_relays_cache: Tuple[float, RelayList] | None = None
+        self._my_bech32: str | None = None
+        # labels that need handling beyond displaying the dm
+        self._dm_handlers: Dict[ChatLabel, Callable[[BitcoinDM], None]] = {
+            ChatLabel.DistrustMeRequest: self._handle_distrust_me,
+            ChatLabel.DeleteMeRequest: self._handle_delete_me,
+        }
 
         self.ui = UI(
             my_keys=self.group_chat.dm_connection.async_dm_connection.keys,
@@ -138,7 +132,9 @@ class BaseNostrSync(QObject):
         # and therefore dismised the message.
         # Here we resubscribe, to get all the messages again
         self.group_chat.dm_connection.run(
-            self.group_chat.dm_connection.async_dm_connection.notification_handler.replay_untrusted_events()
+            self.group_chat.dm_connection.async_dm_connection.notification_handler.replay_untrusted_events(
+                untrusted_device.pub_key_bech32
+            )
         )
 
     def stop(self):
@@ -146,20 +142,36 @@ class BaseNostrSync(QObject):
         self.nostr_protocol.dm_connection.stop()
 
     def get_connected_relays(self) -> RelayList:
-        return RelayList(
+        # querying the relay status blocks until the async thread answers,
+        # so repeated calls within CONNECTED_RELAYS_TTL reuse the last result
+        now = time.monotonic()
+        if self._connected_relays_cache and now - self._connected_relays_cache[0] < CONNECTED_RELAYS_TTL:
+            return self._connected_relays_cache[1]
+        relay_list = RelayList(
             relays=[relay.url() for relay in self.group_chat.dm_connection.get_connected_relays()],
-            last_updated=datetime.now(),
+            last_updated=time.time(),
         )
+        self._connected_relays_cache = (now, relay_list)
+        return relay_list
 
     def on_set_relays(self, relay_list: RelayList):
         logger.info(f"Setting relay_list {relay_list} ")
+        self._connected_relays_cache = None
         self.group_chat.set_relay_list(relay_list)
         self.nostr_protocol.set_relay_list(relay_list)
         self.publish_my_key_in_protocol(force=True)
         logger.info(f"Done Setting relay_list {relay_list} ")
 
-    def is_me(self, public_key: PublicKey) -> bool:
-        return public_key.to_bech32() == self.group_chat.my_public_key().to_bech32()
+    def is_me(self, public_key: PublicKey | str) -> bool:
+        "public_key can also be given as bech32 string"
+        public_key_bech32 = public_key if isinstance(public_key, str) else public_key.to_bech32()
+        return public_key_bech32 == self.my_bech32()
+
+    def my_bech32(self) -> str:
+        "Cached until the own key is reset"
+        if self._my_bech32 is None:
+            self._my_bech32 = self.group_chat.my_public_key().to_bech32()
+        return self._my_bech32
 
     def set_own_key(self):
         nsec = SecretKeyDialog().get_secret_key()
@@ -175,16 +187,14 @@ class BaseNostrSync(QObject):
             return
 
     def reset_own_key(self, keys: Keys | None = None):
+        self._connected_relays_cache = None
+        self._my_bech32 = None
         self.group_chat.renew_own_key(keys=keys)
         self.ui.set_my_keys(self.group_chat.dm_connection.async_dm_connection.keys)
         self.publish_my_key_in_protocol()
 
         # ask the members to trust my new key again (they need to manually approve)
-        for member in self.group_chat.members:
-            self.nostr_protocol.publish_trust_me_back(
-                author_public_key=self.group_chat.my_public_key(),
-                recipient_public_key=member,
-            )
+        self.publish_trust_me_back(self.group_chat.members)
 
         # to receive old messages
         self.group_chat.refresh_dm_connection()
@@ -249,17 +259,27 @@ class BaseNostrSync(QObject):
         sync = cls(**filtered_for_init(d, BaseNostrSync), signals_min=signals_min, parent=parent)
 
         # add the gui elements for the trusted members
-        for member in sync.group_chat.members:
-            if sync.is_me(member):
-                # do not add myself as a device
-                continue
-            untrusted_device = UnTrustedDevice(pub_key_bech32=member.to_bech32(), signals_min=signals_min)
-            sync.ui.add_untrusted_device(untrusted_device)
-            sync.trust_device(untrusted_device, show_message=False)
+        # without repainting the ui after every single device (and chat tab)
+        sync.ui.setUpdatesEnabled(False)
+        try:
+            for member in sync.group_chat.members:
+                if sync.is_me(member):
+                    # do not add myself as a device
+                    continue
+                untrusted_device = UnTrustedDevice(
+                    pub_key_bech32=member.to_bech32(), signals_min=signals_min, public_key=member
+                )
+                sync.ui.add_untrusted_device(untrusted_device)
+                sync.trust_device(untrusted_device, show_message=False, publish=False)
+        finally:
+            sync.ui.setUpdatesEnabled(True)
 
         # restore/replay chat texts
         sync.nostr_protocol.dm_connection.replay_events_from_dump()
         sync.group_chat.dm_connection.replay_events_from_dump()
+
+        # the trust requests are sent in one go, after the restore is done
+        sync.publish_trust_me_back([member for member in sync.group_chat.members if not sync.is_me(member)])
         return sync
 
     def subscribe(self):
@@ -274,18 +294,33 @@ class BaseNostrSync(QObject):
     def publish_my_key_in_protocol(self, force=False):
         self.nostr_protocol.publish_public_key(self.group_chat.my_public_key(), force=force)
 
+    def publish_trust_me_back(self, members: List[PublicKey]):
+        self.nostr_protocol.publish_trust_me_back_batch(
+            author_public_key=self.group_chat.my_public_key(),
+            recipient_public_keys=members,
+        )
+
     def on_dm(self, dm: BitcoinDM):
         if not dm.author:
-            logger.debug(f"Dropping {dm}, because not author, and with that author can be determined.")
+            logger.debug("Dropping %s, because not author, and with that author can be determined.", dm)
+            return
+
+        handler = self._dm_handlers.get(dm.label)
+        if handler:
+            handler(dm)
+
+    def _handle_distrust_me(self, dm: BitcoinDM):
+        if not dm.author or self.is_me(dm.author):
             return
+        self.untrust_key(dm.author)
 
-        elif dm.label == ChatLabel.DistrustMeRequest and not self.is_me(dm.author):
-            self.untrust_key(dm.author)
-        elif dm.label == ChatLabel.DeleteMeRequest and not self.is_me(dm.author):
-            self.untrust_key(dm.author)
-            untrusted_device = self.ui.untrusted_devices.get_device(dm.author.to_bech32())
-            if untrusted_device:
-                self.ui.untrusted_devices.remove_device(untrusted_device)
+    def _handle_delete_me(self, dm: BitcoinDM):
+        if not dm.author or self.is_me(dm.author):
+            return
+        self.untrust_key(dm.author)
+        untrusted_device = self.ui.untrusted_devices.get_device(dm.author.to_bech32())
+        if untrusted_device:
+            self.ui.untrusted_devices.remove_device(untrusted_device)
 
     def untrust_key(self, member: PublicKey):
         trusted_device = self.ui.trusted_devices.get_device(member.to_bech32())
@@ -334,11 +369,11 @@ class BaseNostrSync(QObject):
         return dm
 
     def connect_untrusted_device(self, untrusted_device: UnTrustedDevice):
-        if untrusted_device.pub_key_bech32 in [k.to_bech32() for k in self.group_chat.members]:
+        if self.group_chat.is_member(untrusted_device.pub_key_bech32):
             self.trust_device(untrusted_device, show_message=False)
 
     def on_signal_protocol_dm(self, dm: ProtocolDM):
-        if self.is_me(PublicKey.from_bech32(dm.public_key_bech32)):
+        if self.is_me(dm.public_key_bech32):
             # if I'm the autor do noting
             return
 
@@ -358,13 +393,16 @@ class BaseNostrSync(QObject):
             untrusted_device2.set_button_status_to_accept()
 
     def untrust_device(self, trusted_device: TrustedDevice):
-        self.group_chat.remove_member(PublicKey.from_bech32(trusted_device.pub_key_bech32))
+        self.group_chat.remove_member(trusted_device.public_key)
         untrusted_device = self.ui.untrust_device(trusted_device)
         self.connect_untrusted_device(untrusted_device)
         self.signal_remove_trusted_device.emit(trusted_device)
 
-    def trust_device(self, untrusted_device: UnTrustedDevice, show_message=True) -> TrustedDevice:
-        device_public_key = PublicKey.from_bech32(untrusted_device.pub_key_bech32)
+    def trust_device(
+        self, untrusted_device: UnTrustedDevice, show_message=True, publish=True
+    ) -> TrustedDevice:
+        "publish=False only does the local bookkeeping, without asking the device to trust me back"
+        device_public_key = untrusted_device.public_key
         self.group_chat.add_member(device_public_key)
         trusted_device = self.ui.trust_device(
             untrusted_device,
@@ -380,7 +418,7 @@ class BaseNostrSync(QObject):
                     "To complete the connection, accept my {id} request on the other device {other}."
                 ).format(
                     id=html_f(
-                        short_key(self.group_chat.my_public_key().to_bech32()),
+                        short_key(self.my_bech32()),
                         bf=True,
                     ),
                     other=html_f(short_key(untrusted_device.pub_key_bech32), bf=True),
@@ -389,10 +427,8 @@ class BaseNostrSync(QObject):
 
         self.signal_add_trusted_device.emit(trusted_device)
 
-        self.nostr_protocol.publish_trust_me_back(
-            author_public_key=self.group_chat.my_public_key(),
-            recipient_public_key=device_public_key,
-        )
+        if publish:
+            self.publish_trust_me_back([device_public_key])
         return trusted_device
 
 
@@ -404,7 +440,7 @@ class NostrSync(BaseNostrSync):
         group_chat: GroupChat,
         signals_min: SignalsMin,
         individual_chats_visible=True,
-        hide_data_types_in_chat: tuple[DataType] = (DataType.LabelsBip329,),
+        hide_data_types_in_chat: Iterable[DataType] | None = None,
         use_compression=DEFAULT_USE_COMPRESSION,
         debug=False,
         parent: QObject | None = None,
@@ -444,7 +480,7 @@ class NostrSyncWithSingleChats(BaseNostrSync):
         group_chat: GroupChat,
         signals_min: SignalsMin,
         individual_chats_visible=True,
-        hide_data_types_in_chat: tuple[DataType] = (DataType.LabelsBip329,),
+        hide_data_types_in_chat: Iterable[DataType] | None = None,
         use_compression=DEFAULT_USE_COMPRESSION,
         debug=False,
         parent: QObject | None = None,
@@ -486,7 +522,7 @@ class NostrSyncWithSingleChats(BaseNostrSync):
             group_chat=self.group_chat,
             signals_min=self.signals_min,
             use_compression=self.use_compression,
-            restrict_to_counterparties=[PublicKey.from_bech32(trusted_device.pub_key_bech32)],
+            restrict_to_counterparties=[trusted_device.public_key],
             display_labels=[ChatLabel.SingleRecipient],
             send_label=ChatLabel.SingleRecipient,
         )
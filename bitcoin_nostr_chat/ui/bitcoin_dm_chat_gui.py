@@ -28,7 +28,9 @@
 
 
 import logging
+import weakref
 from datetime import datetime
+from typing import Iterator
 
 import bdkpython as bdk
 
@@ -47,7 +49,14 @@ from collections import deque
 class BitcoinDmChatGui(ChatGui):
     def __init__(self, signals_min: SignalsMin):
         super().__init__(signals_min)
-        self.dms: deque[BitcoinDM] = deque(maxlen=10000)
+        # weak, so the dms are freed once they are removed from the processed dms
+        self.dms: deque[weakref.ref[BitcoinDM]] = deque(maxlen=10000)
+
+    def iter_dms(self) -> Iterator[BitcoinDM]:
+        for ref in self.dms:
+            dm = ref()
+            if dm is not None:
+                yield dm
 
     def add_dm(self, dm: BitcoinDM, is_me: bool):
         if not dm.author:
@@ -75,4 +84,4 @@ class BitcoinDmChatGui(ChatGui):
                 created_at=dm.created_at if dm.created_at else datetime.now(),
             )
 
-        self.dms.append(dm)
+        self.dms.append(weakref.ref(dm))
@@ -28,7 +28,9 @@
 
 
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 
 from bitcoin_nostr_chat.dialogs import file_to_str
 from bitcoin_nostr_chat.signals_min import SignalsMin
@@ -40,7 +42,7 @@ logger = logging.getLogger(__name__)
 import os
 
 from bitcoin_qr_tools.data import Data
-from PyQt6.QtCore import QModelIndex, QSize, Qt, pyqtSignal
+from PyQt6.QtCore import QModelIndex, QSize, Qt, QTimer, pyqtSignal
 from PyQt6.QtGui import (
     QAction,
     QBrush,
@@ -64,6 +66,15 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 
+# reading a large file must not block the gui thread
+_FILE_READ_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="file_to_str")
+
+
+@lru_cache(maxsize=32)
+def _color_brush(color: str) -> QBrush:
+    "The chat only uses a few colors, so the parsed brushes are reused for every message"
+    return QBrush(QColor(color))
+
 
 class MultiLineListView(QWidget):
     signal_clear = pyqtSignal()
@@ -75,6 +86,9 @@ class MultiLineListView(QWidget):
         super().__init__()
         self.listView = QListView(self)
         self.listView.setWordWrap(True)
+        # lay out long histories in batches, instead of measuring every wrapped row at once
+        self.listView.setLayoutMode(QListView.LayoutMode.Batched)
+        self.listView.setBatchSize(200)
         self.listView.clicked.connect(lambda qmodel_index: self.onItemClicked(qmodel_index))
 
         self.model = QStandardItemModel(self.listView)
@@ -82,24 +96,26 @@ class MultiLineListView(QWidget):
 
         # Enable sorting
         self.model.setSortRole(self.ROLE_SORT)  # Use the display text for sorting
+        self._pending_scroll_item: QStandardItem | None = None
 
         self._layout = QVBoxLayout(self)
         self._layout.addWidget(self.listView)
         self._layout.setContentsMargins(0, 0, 0, 0)  # Left, Top, Right, Bottom margins
 
-    def contextMenuEvent(self, event: QContextMenuEvent | None) -> None:
-        menu = QMenu(self)
-
-        # Add actions to the menu
-        action1 = QAction(self.tr("Delete all messages"), self)
-        menu.addAction(action1)
+        # the context menu is built once and only shown in contextMenuEvent
+        self._context_menu = QMenu(self)
+        self._action_delete_all = QAction(self)
+        self._action_delete_all.triggered.connect(self.on_delete_all_messages)
+        self._context_menu.addAction(self._action_delete_all)
+        self.updateUi()
 
-        # Connect actions to slots (functions)
-        action1.triggered.connect(self.on_delete_all_messages)
+    def updateUi(self):
+        self._action_delete_all.setText(self.tr("Delete all messages"))
 
+    def contextMenuEvent(self, event: QContextMenuEvent | None) -> None:
         # Pop up the menu at the current mouse position.
         if event:
-            menu.exec(event.globalPos())
+            self._context_menu.exec(event.globalPos())
         super().contextMenuEvent(event)
 
     def on_delete_all_messages(self):
@@ -109,19 +125,37 @@ class MultiLineListView(QWidget):
 
     def addItem(self, text: str, created_at: datetime, icon=None) -> QStandardItem:
         """Add an item with the specified text and an optional icon to the list."""
-        item = QStandardItem()
-        item.setText(text)
-        if icon:
-            item.setIcon(QIcon(icon))
+        # pass text and icon to the constructor, instead of setting them one by one
+        item = QStandardItem(QIcon(icon), text) if icon else QStandardItem(text)
         item.setEditable(False)
-        self.model.appendRow(item)
         item.setData(created_at, self.ROLE_SORT)
-
-        # Sort the model initially
-        self.model.sort(0)  # Sort by the first (and only) column
-        self.scroll_to_item(item)
+        # insert at the sorted position, instead of resorting the whole model for every item
+        self.model.insertRow(self._sorted_row(created_at), item)
+
+        # scrolling lays out the items, so when many items are added at once
+        # only scroll once (to the last one) in the next event loop iteration
+        if self._pending_scroll_item is None:
+            QTimer.singleShot(0, self._scroll_to_pending_item)
+        self._pending_scroll_item = item
         return item
 
+    def _scroll_to_pending_item(self):
+        item, self._pending_scroll_item = self._pending_scroll_item, None
+        if item:
+            self.scroll_to_item(item)
+
+    def _sorted_row(self, created_at: datetime) -> int:
+        "Binary search for the row after all items with created_at <= the given one (like a stable sort)"
+        low, high = 0, self.model.rowCount()
+        while low < high:
+            middle = (low + high) // 2
+            item = self.model.item(middle)
+            if item and created_at < item.data(self.ROLE_SORT):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
     def scroll_to_item(self, item):
         # Get the index of the item
         index = self.model.indexFromItem(item)
@@ -130,6 +164,7 @@ class MultiLineListView(QWidget):
 
     def clearItems(self):
         """Clear all items from the list."""
+        self._pending_scroll_item = None
         self.model.clear()
 
     def getItemTextAtIndex(self, index: QModelIndex):
@@ -186,6 +221,7 @@ class ChatListWidget(MultiLineListView):
 class ChatGui(QWidget):
     signal_on_message_send = pyqtSignal(str)
     signal_share_filecontent = pyqtSignal(str, str)  # file_content, filename
+    signal_file_read = pyqtSignal(Future, str)  # Future[str], filename
 
     def __init__(self, signals_min: SignalsMin):
         super().__init__()
@@ -206,18 +242,27 @@ class ChatGui(QWidget):
 
         # Placeholder for the dynamic layout
         self.dynamicLayout = QVBoxLayout()
+        self._layout_is_horizontal: bool | None = None
         self.updateDynamicLayout()
+        # a window drag produces many resize events, only check the layout once it settles
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(50)
+        self._resize_timer.timeout.connect(self.updateDynamicLayout)
         self.updateUi()
 
         # Connect signals
         self.sendButton.clicked.connect(self.on_send_hit)
         self.textInput.returnPressed.connect(self.on_send_hit)
         signals_min.language_switch.connect(self.updateUi)
+        # the future is done in the worker thread, this is queued back into the main thread
+        self.signal_file_read.connect(self.on_file_read)
 
     def updateUi(self):
         self.textInput.setPlaceholderText(self.tr("Type your message here..."))
         self.shareButton.setToolTip(self.tr("Share a PSBT"))
         self.sendButton.setText(self.tr("Send"))
+        self.chat_list_display.updateUi()
 
     def textChanged(self, text: str):
         there_is_text = bool(self.textInput.text())
@@ -238,13 +283,24 @@ class ChatGui(QWidget):
             return
 
         logger.debug(f"Selected file: {file_path}")
-        self.signal_share_filecontent.emit(file_to_str(file_path), os.path.basename(file_path))
+        file_name = os.path.basename(file_path)
+        future = _FILE_READ_EXECUTOR.submit(file_to_str, file_path)
+        future.add_done_callback(lambda future: self.signal_file_read.emit(future, file_name))
+
+    def on_file_read(self, future: Future, file_name: str):
+        try:
+            file_content: str = future.result()
+        except OSError as e:
+            logger.error(f"Could not read {file_name}: {e}")
+            return
+        self.signal_share_filecontent.emit(file_content, file_name)
 
     def updateDynamicLayout(self):
         threashold = 200
-        expected_layout_class = QHBoxLayout if self.width() > threashold else QVBoxLayout
-        if isinstance(self.dynamicLayout, expected_layout_class):
+        is_horizontal = self.width() > threashold
+        if is_horizontal == self._layout_is_horizontal:
             return
+        self._layout_is_horizontal = is_horizontal
 
         # Clear the dynamic layout first
         while self.dynamicLayout.count():
@@ -252,7 +308,7 @@ class ChatGui(QWidget):
             if layout_item and (_widget := layout_item.widget()):
                 _widget.setParent(None)
 
-        self.dynamicLayout = expected_layout_class()
+        self.dynamicLayout = QHBoxLayout() if is_horizontal else QVBoxLayout()
         self.dynamicLayout.addWidget(self.textInput)
         self.dynamicLayout.addWidget(self.sendButton)
         self.dynamicLayout.addWidget(self.shareButton)
@@ -260,7 +316,7 @@ class ChatGui(QWidget):
         self._layout.addLayout(self.dynamicLayout)
 
     def resizeEvent(self, event: QResizeEvent | None) -> None:
-        self.updateDynamicLayout()
+        self._resize_timer.start()
         super().resizeEvent(event)
 
     def on_send_hit(self):
@@ -274,7 +330,7 @@ class ChatGui(QWidget):
     def _add_message(self, text: str, alignment: Qt.AlignmentFlag, color: str, created_at: datetime):
         item = self.chat_list_display.addItem(text, created_at=created_at)
         item.setTextAlignment(alignment)
-        item.setForeground(QBrush(QColor(color)))
+        item.setForeground(_color_brush(color))
 
     def _add_file(
         self,
@@ -286,7 +342,7 @@ class ChatGui(QWidget):
     ):
         item = self.chat_list_display.add_file(file_object, created_at=created_at)
         item.setTextAlignment(alignment)
-        item.setForeground(QBrush(QColor(color)))
+        item.setForeground(_color_brush(color))
         item.setText(text)
 
     def add_own(self, created_at: datetime, text: str = "", file_object: FileObject | None = None):
@@ -41,9 +41,9 @@ from ..signals_min import SignalsMin
 logger = logging.getLogger(__name__)
 
 import uuid
-from typing import Callable, Generic, List, Optional, Type, TypeVar
+from typing import Callable, Dict, Generic, List, Optional, Type, TypeVar
 
-from nostr_sdk import Keys
+from nostr_sdk import Keys, PublicKey
 from PyQt6 import QtCore, QtWidgets
 from PyQt6.QtCore import Qt, QTimer, pyqtSignal
 from PyQt6.QtGui import QFont, QResizeEvent
@@ -138,14 +138,22 @@ class CloseButton(QtWidgets.QPushButton):
 class BaseDevice(QWidget):
     signal_close = QtCore.pyqtSignal(QWidget)
 
-    def __init__(self, pub_key_bech32: str):
+    def __init__(self, pub_key_bech32: str, public_key: Optional[PublicKey] = None):
         super().__init__()
         self.pub_key_bech32 = pub_key_bech32
+        self._public_key = public_key
         self.close_button: Optional[QPushButton] = None
 
         self._layout = QtWidgets.QVBoxLayout(self)
         self._layout.setContentsMargins(0, 0, 0, 0)  # Left, Top, Right, Bottom margins
 
+    @property
+    def public_key(self) -> PublicKey:
+        "Parsed at most once, since from_bech32 decodes and validates the key"
+        if self._public_key is None:
+            self._public_key = PublicKey.from_bech32(self.pub_key_bech32)
+        return self._public_key
+
     def resizeEvent(self, event: QResizeEvent | None) -> None:
         if self.close_button:
             self.close_button.move(self.width() - self.close_button.width(), 0)
@@ -159,8 +167,8 @@ class BaseDevice(QWidget):
 class UnTrustedDevice(BaseDevice):
     signal_trust_me = QtCore.pyqtSignal(str)
 
-    def __init__(self, pub_key_bech32: str, signals_min: SignalsMin):
-        super().__init__(pub_key_bech32)
+    def __init__(self, pub_key_bech32: str, signals_min: SignalsMin, public_key: Optional[PublicKey] = None):
+        super().__init__(pub_key_bech32, public_key=public_key)
         self.signals_min = signals_min
 
         self.button_add_trusted = QPushButton()
@@ -202,8 +210,9 @@ class TrustedDevice(BaseDevice):
         self,
         pub_key_bech32: str,
         signals_min: SignalsMin,
+        public_key: Optional[PublicKey] = None,
     ):
-        super().__init__(pub_key_bech32)
+        super().__init__(pub_key_bech32, public_key=public_key)
         self.signals_min = signals_min
 
         self.groupbox = QGroupBox()
@@ -267,6 +276,7 @@ class TrustedDevice(BaseDevice):
         return TrustedDevice(
             untrusted_device.pub_key_bech32,
             signals_min=untrusted_device.signals_min,
+            public_key=untrusted_device.public_key,
         )
 
 
@@ -282,6 +292,8 @@ class DeviceList(Generic[T], QtWidgets.QWidget):
     ):
         super().__init__()
         self.device_class = device_class
+        # index of the devices in the layout, to avoid scanning the widget tree on every lookup
+        self._devices: Dict[str, T] = {}
 
         self.main_layout = QtWidgets.QVBoxLayout(self)
         self.main_layout.setAlignment(QtCore.Qt.AlignmentFlag.AlignTop)
@@ -300,11 +312,15 @@ class DeviceList(Generic[T], QtWidgets.QWidget):
             return False
         device.signal_close.connect(self.remove_device)
 
+        self._devices[device.pub_key_bech32] = device
         self.scrollarea.content_widget_layout.addWidget(device)
         self.signal_added_device.emit(device)
         return True
 
     def remove_device(self, device: T):
+        # another instance with the same key may be in the list, so only remove this one
+        if self._devices.get(device.pub_key_bech32) is device:
+            del self._devices[device.pub_key_bech32]
         device.setParent(None)
         self.scrollarea.content_widget_layout.removeWidget(device)
 
@@ -312,19 +328,13 @@ class DeviceList(Generic[T], QtWidgets.QWidget):
         device.deleteLater()
 
     def device_already_present(self, pub_key_bech32: str) -> bool:
-        for device in self.get_devices():
-            if device.pub_key_bech32 == pub_key_bech32:
-                return True
-        return False
+        return pub_key_bech32 in self._devices
 
     def get_device(self, pub_key_bech32: str) -> Optional[T]:
-        for device in self.get_devices():
-            if device.pub_key_bech32 == pub_key_bech32:
-                return device
-        return None
+        return self._devices.get(pub_key_bech32)
 
     def get_devices(self) -> List[T]:
-        return self.scrollarea.content_widget.findChildren(self.device_class)
+        return list(self._devices.values())
 
 
 class UI(QtWidgets.QWidget):
@@ -489,7 +499,9 @@ class UI(QtWidgets.QWidget):
             return device
 
         untrusted_device = UnTrustedDevice(
-            pub_key_bech32=trusted_device.pub_key_bech32, signals_min=self.signals_min
+            pub_key_bech32=trusted_device.pub_key_bech32,
+            signals_min=self.signals_min,
+            public_key=trusted_device.public_key,
         )
         self.add_untrusted_device(untrusted_device)
         return untrusted_device
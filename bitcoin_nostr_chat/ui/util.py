@@ -1,21 +1,37 @@
 import os
+from functools import lru_cache
 
 from PyQt6.QtGui import QIcon
 
+# realpath resolves symlinks on the filesystem, so only do it once
+_PKG_DIR = os.path.dirname(os.path.realpath(__file__))
+
 
 def resource_path(*parts):
-    pkg_dir = os.path.split(os.path.realpath(__file__))[0]
-    return os.path.join(pkg_dir, *parts)
+    return os.path.join(_PKG_DIR, *parts)
 
 
 def icon_path(icon_basename: str):
     return resource_path("icons", icon_basename)
 
 
+@lru_cache(maxsize=128)
+def _load_QIcon(icon_basename: str) -> QIcon:
+    return QIcon(icon_path(icon_basename))
+
+
+@lru_cache(maxsize=None)
+def _empty_QIcon() -> QIcon:
+    return QIcon()
+
+
 def read_QIcon(icon_basename: str) -> QIcon:
     if not icon_basename:
-        return QIcon()
-    return QIcon(icon_path(icon_basename))
+        # shared null icon, widgets store their own copy in setIcon
+        return _empty_QIcon()
+    # the file is loaded (and rendered) only once,
+    # the returned copy shares the data with the cached icon
+    return QIcon(_load_QIcon(icon_basename))
 
 
 def short_key(pub_key_bech32: str):
@@ -1,4 +1,5 @@
-from typing import Callable, Dict, Iterable, Type
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, Hashable, Iterable, Type, cast
 
 
 def varnames(method: Callable) -> Iterable[str]:
@@ -9,5 +10,12 @@ def filtered_dict(d: Dict, allowed_keys: Iterable[str]) -> Dict:
     return {k: v for k, v in d.items() if k in allowed_keys}
 
 
+@lru_cache(maxsize=None)
+def _init_varnames(cls: Type) -> FrozenSet[str]:
+    "The signature of a class does not change, so it is inspected once per class"
+    return frozenset(varnames(cls.__init__))
+
+
 def filtered_for_init(d: Dict, cls: Type) -> Dict:
-    return filtered_dict(d, varnames(cls.__init__))
+    # classes are hashable, but mypy does not know that of Type[Any]
+    return filtered_dict(d, _init_varnames(cast(Hashable, cls)))
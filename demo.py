@@ -6,6 +6,7 @@ logging.basicConfig(level=logging.DEBUG)
 import argparse
 import hashlib
 import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional
 from uuid import uuid4
 
@@ -18,6 +19,9 @@ from bitcoin_nostr_chat.signals_min import SignalsMin
 
 logger = logging.getLogger(__name__)  # Getting the root logger
 
+# writes the dump on close, without blocking the window from closing
+_SAVE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="demo-save")
+
 import sys
 
 from PyQt6.QtWidgets import QApplication, QMainWindow
@@ -32,8 +36,11 @@ def save_dict_to_file(dict_obj: Dict, file_path: str):
     - file_path: The path of the file where the dictionary will be saved.
     """
     try:
-        with open(file_path, "w") as json_file:
-            json.dump(dict_obj, json_file)
+        # json.dumps uses the C encoder, json.dump the pure python iterencode
+        # minified, and non-ascii text written as is instead of \uXXXX escapes
+        serialized = json.dumps(dict_obj, separators=(",", ":"), ensure_ascii=False)
+        with open(file_path, "w", encoding="utf-8") as json_file:
+            json_file.write(serialized)
     except IOError as e:
         print(f"Error saving dictionary to {file_path}: {e}")
 
@@ -49,7 +56,7 @@ def load_dict_from_file(file_path: str):
     - The dictionary restored from the file. Returns None if an error occurs.
     """
     try:
-        with open(file_path, "r") as json_file:
+        with open(file_path, "r", encoding="utf-8") as json_file:
             return json.load(json_file)
     except IOError as e:
         print(f"Error loading dictionary from {file_path}: {e}")
@@ -91,7 +98,8 @@ class DemoApp(QMainWindow):
         self.setWindowTitle("Demo App")
 
     def closeEvent(self, event: Optional[QCloseEvent]) -> None:
-        save_dict_to_file(self.nostr_sync.dump(), self.file_name)
+        # the dump reads state shared with the gui, so only serializing and writing is moved off the gui thread
+        _SAVE_EXECUTOR.submit(save_dict_to_file, self.nostr_sync.dump(), self.file_name)
         self.nostr_sync.stop()
         super().closeEvent(event)
 
@@ -128,12 +136,13 @@ def main(args):
     )
     demoApp.show()
     app.exec()
+    # make sure the file is completely written before exiting
+    _SAVE_EXECUTOR.shutdown(wait=True)
 
 
 if __name__ == "__main__":
     import cProfile
-    import os
-    from pstats import Stats
+    import subprocess
 
     args = parse_args()
 
@@ -141,13 +150,9 @@ if __name__ == "__main__":
         with cProfile.Profile() as pr:
             main(args)
 
-        # run in bash "snakeviz .prof_stats &"  to visualize the stats
-        with open("profiling_stats.txt", "w") as stream:
-            stats = Stats(pr, stream=stream)
-            stats.strip_dirs()
-            stats.sort_stats("time")
-            stats.dump_stats(".prof_stats")
-            os.system("snakeviz .prof_stats & ")
-            # os.system("pyprof2calltree -i .prof_stats -k & ")
+        # snakeviz reads the raw profile itself, no need to build and sort a pstats.Stats
+        pr.dump_stats(".prof_stats")
+        subprocess.Popen(["snakeviz", ".prof_stats"], start_new_session=True)
+        # subprocess.Popen(["pyprof2calltree", "-i", ".prof_stats", "-k"], start_new_session=True)
     else:
         main(args)
@@ -1,4 +1,5 @@
 import pytest
+from nostr_sdk import Keys
 
 
 def pytest_addoption(parser):
@@ -27,3 +28,9 @@ def pytest_collection_modifyitems(config, items):
         for item in items:
             if "testrelays" in item.keywords:
                 item.add_marker(skip_testrelays)
+
+
+@pytest.fixture(scope="session")
+def keys() -> Keys:
+    "One keypair for all tests, instead of generating one per test"
+    return Keys.generate()
@@ -1,9 +1,14 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
+from time import time
 from typing import List
+from uuid import uuid4
 
 import bdkpython as bdk
 import pytest
+import websocket
 from nostr_sdk import Keys
 from PyQt6.QtCore import QObject, pyqtSignal
 from pytestqt.qtbot import QtBot
@@ -13,90 +18,114 @@ from bitcoin_nostr_chat.nostr import BitcoinDM, ChatLabel, DmConnection, RelayLi
 
 logger = logging.getLogger(__name__)
 
+FROM_SERIALIZED_REGTEST = partial(BitcoinDM.from_serialized, network=bdk.Network.REGTEST)
 
-# @pytest.mark.parametrize("url", get_preferred_relays())
-# def test_preferred_relays(url):
-#     """Test each relay to ensure WebSocket connection is established."""
-#     try:
-#         # Timeout for the WebSocket connection
-#         ws = websocket.create_connection(url, timeout=10)
-#         ws.close()  # Close the connection after successful connection
-#     except websocket.WebSocketTimeoutException:
-#         pytest.fail(f"Connection timed out for {url}")
-#     except websocket.WebSocketException as e:
-#         pytest.fail(f"WebSocket connection failed for {url}: {str(e)}")
+
+@pytest.mark.testrelays
+def test_preferred_relays():
+    """Test each relay to ensure WebSocket connection is established."""
+    urls = list(dict.fromkeys(get_preferred_relays()))
+
+    def probe(url: str):
+        # Timeout for the WebSocket connection
+        ws = websocket.create_connection(url, timeout=10)
+        ws.close()  # Close the connection after successful connection
+
+    # probe all relays at once, such that the timeouts overlap instead of adding up
+    with ThreadPoolExecutor(max_workers=min(32, len(urls))) as executor:
+        futures = {url: executor.submit(probe, url) for url in urls}
+
+    failures = []
+    for url, future in futures.items():
+        try:
+            future.result()
+        except websocket.WebSocketTimeoutException:
+            failures.append(f"Connection timed out for {url}")
+        except Exception as e:
+            failures.append(f"WebSocket connection failed for {url}: {str(e)}")
+    if failures:
+        pytest.fail("\n".join(failures))
 
 
 class TestClass(QObject):
     signal_dm = pyqtSignal(BitcoinDM)
 
 
-def send_dms(qtbot: QtBot, relays: List[str], raise_error: bool):
-    network = bdk.Network.REGTEST
-
+def send_dms(qtbot: QtBot, keys: Keys, relays: List[str], raise_error: bool) -> List[str]:
+    # every relay once (keeping the order), a duplicate would wait for a second dm that never arrives
+    relays = list(dict.fromkeys(relays))
     test_instance = TestClass()
-    from_serialized = lambda base64_encoded_data: BitcoinDM.from_serialized(
-        base64_encoded_data, network=network
-    )
-    keys = Keys.generate()
-    get_currently_allowed = lambda: set([keys.public_key().to_bech32()])
+    # only read by the connections, so the same frozenset can be returned every time
+    allowed = frozenset([keys.public_key().to_bech32()])
+    get_currently_allowed = lambda: allowed
+
+    successful_relays: List[str] = []
+    # the keys are shared between tests and the relays return earlier dms to them,
+    # so only count the dms sent in this run
+    run_id = uuid4().hex[:8]
+    relay_by_description = {f"Test {run_id}: {relay}": relay for relay in relays}
+
+    def add_to_chat(dm: BitcoinDM):
+        logger.info(f"Success: {dm.description}")
+        relay = relay_by_description.get(dm.description)
+        if relay and relay not in successful_relays:
+            successful_relays.append(relay)
 
-    successful_relays = []
+    test_instance.signal_dm.connect(add_to_chat)
 
+    # connect to all relays first, and then send over all of them at once,
+    # such that the relays are waited for in parallel and not one after the other
     dm_connections: List[DmConnection] = []
-    for relay in relays:
-        logger.info(f"*" * 50)
-        logger.info(f"relay: {relay}")
-
-        dm_connection = DmConnection(
-            test_instance.signal_dm,
-            from_serialized=from_serialized,
-            keys=keys,
-            get_currently_allowed=get_currently_allowed,
-            relay_list=RelayList(relays=[relay], last_updated=datetime.now(), max_age=5000),
-        )
-        dm_connections.append(dm_connection)
-        dm_connection.subscribe()
-
-        dm = BitcoinDM(
-            label=ChatLabel.GroupChat,
-            created_at=datetime.now(),
-            description=f"Test: {relay}",
-        )
-
-        def add_to_chat(dm: BitcoinDM):
-            logger.info(f"Success: {dm.description}")
-            successful_relays.append(relay)
-
-        test_instance.signal_dm.connect(add_to_chat)
+    now = datetime.now()
+    try:
+        for relay in relays:
+            logger.info(f"relay: {relay}")
+            dm_connection = DmConnection(
+                test_instance.signal_dm,
+                from_serialized=FROM_SERIALIZED_REGTEST,
+                keys=keys,
+                get_currently_allowed=get_currently_allowed,
+                relay_list=RelayList(relays=[relay], last_updated=time(), max_age=5000),
+            )
+            dm_connections.append(dm_connection)
+            dm_connection.subscribe()
+
+        for relay, dm_connection in zip(relays, dm_connections):
+            dm = BitcoinDM(
+                label=ChatLabel.GroupChat,
+                created_at=now,
+                description=f"Test {run_id}: {relay}",
+            )
+            dm_connection.send(dm, receiver=keys.public_key())
 
         try:
-            with qtbot.waitSignal(test_instance.signal_dm, timeout=10000):
-                dm_connection.send(dm, receiver=keys.public_key())
+            qtbot.waitUntil(lambda: len(successful_relays) == len(relays), timeout=10000)
         except Exception as e:
-            logger.error(f"not working: {relay}")
+            not_working = [relay for relay in relays if relay not in successful_relays]
+            logger.error(f"not working: {not_working}")
             if raise_error:
-                raise Exception(f"not working: {relay} , original_message {e}")
-        finally:
+                raise Exception(f"not working: {not_working} , original_message {e}")
+    finally:
+        for dm_connection in dm_connections:
             dm_connection.disconnect()
-            dm_connection.stop()
-            test_instance.signal_dm.disconnect(add_to_chat)
+        # stop() waits for the event loop thread of the connection, so wait for all of them at once
+        if dm_connections:
+            with ThreadPoolExecutor(max_workers=min(16, len(dm_connections))) as executor:
+                list(executor.map(DmConnection.stop, dm_connections))
+        test_instance.signal_dm.disconnect(add_to_chat)
 
     logger.info(f"=" * 50)
     logger.info(f"Good relays: {successful_relays}")
     logger.info(f"=" * 50)
+    return successful_relays
 
 
-def test_send_dms_preffered(
-    qtbot: QtBot,
-) -> None:
+def test_send_dms_preffered(qtbot: QtBot, keys: Keys) -> None:
 
-    send_dms(qtbot, relays=get_preferred_relays(), raise_error=True)
+    send_dms(qtbot, keys, relays=get_preferred_relays(), raise_error=True)
 
 
 @pytest.mark.testrelays
-def test_send_dms(
-    qtbot: QtBot,
-) -> None:
+def test_send_dms(qtbot: QtBot, keys: Keys) -> None:
 
-    send_dms(qtbot, relays=get_default_delays(), raise_error=False)
+    send_dms(qtbot, keys, relays=get_default_delays(), raise_error=False)
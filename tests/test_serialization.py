@@ -0,0 +1,116 @@
+import base64
+import json
+import random
+import zlib
+from datetime import datetime
+
+import bdkpython as bdk
+import cbor2
+import pytest
+
+from bitcoin_nostr_chat import nostr
+from bitcoin_nostr_chat.nostr import (
+    FORMAT_TAG_JSON,
+    FORMAT_TAG_ZLIB_CBOR_B64,
+    FORMAT_TAG_ZLIB_CBOR_B85,
+    MIN_COMPRESSION_SIZE,
+    BitcoinDM,
+    ChatLabel,
+    b85decode,
+)
+
+NETWORK = bdk.Network.REGTEST
+
+
+def test_b85decode_matches_stdlib():
+    rng = random.Random(0)
+    for length in range(0, 200):
+        encoded = base64.b85encode(rng.randbytes(length)).decode()
+        assert b85decode(encoded) == base64.b85decode(encoded)
+
+
+def test_b85decode_truncated():
+    encoded = base64.b85encode(bytes(range(64))).decode()
+    for end in range(len(encoded)):
+        truncated = encoded[:end]
+        try:
+            expected = base64.b85decode(truncated)
+        except ValueError:
+            with pytest.raises(ValueError):
+                b85decode(truncated)
+        else:
+            assert b85decode(truncated) == expected
+
+
+@pytest.mark.parametrize("data", ['abc"d', "abcd ", "abc,d", "ab\\cd"])
+def test_b85decode_bad_character(data: str):
+    with pytest.raises(ValueError):
+        base64.b85decode(data)
+    with pytest.raises(ValueError):
+        b85decode(data)
+
+
+@pytest.mark.parametrize("data", ["~~~~~", "|NsC1", "0000~~~~~"])
+def test_b85decode_overflow(data: str):
+    with pytest.raises(ValueError):
+        base64.b85decode(data)
+    with pytest.raises(ValueError):
+        b85decode(data)
+
+
+def make_dm(description: str, use_compression: bool) -> BitcoinDM:
+    return BitcoinDM(
+        label=ChatLabel.GroupChat,
+        created_at=datetime.now(),
+        description=description,
+        use_compression=use_compression,
+    )
+
+
+def assert_round_trip(dm: BitcoinDM, serialized: str):
+    restored = BitcoinDM.from_serialized(serialized, network=NETWORK)
+    assert restored.description == dm.description
+    assert restored.label == dm.label
+    assert restored.created_at == dm.created_at
+
+
+@pytest.mark.parametrize("use_compression", [True, False])
+@pytest.mark.parametrize("description", ["short", "long " * MIN_COMPRESSION_SIZE])
+def test_serialize_emits_legacy_format(description: str, use_compression: bool):
+    dm = make_dm(description, use_compression)
+    serialized = dm.serialize()
+    assert serialized[:2] not in nostr.FORMAT_DECODERS
+    assert_round_trip(dm, serialized)
+
+
+@pytest.mark.parametrize(
+    "description, use_compression, tag",
+    [
+        ("short", True, FORMAT_TAG_JSON),
+        ("short", False, FORMAT_TAG_JSON),
+        ("long " * MIN_COMPRESSION_SIZE, False, FORMAT_TAG_JSON),
+        ("long " * MIN_COMPRESSION_SIZE, True, FORMAT_TAG_ZLIB_CBOR_B64),
+    ],
+)
+def test_serialize_emits_format_tags(
+    monkeypatch: pytest.MonkeyPatch, description: str, use_compression: bool, tag: str
+):
+    monkeypatch.setattr(nostr, "EMIT_FORMAT_TAGS", True)
+    dm = make_dm(description, use_compression)
+    serialized = dm.serialize()
+    assert serialized.startswith(tag)
+    assert_round_trip(dm, serialized)
+
+
+def test_from_serialized_all_formats():
+    dm = make_dm("all formats " * 50, use_compression=True)
+    compressed = zlib.compress(cbor2.dumps(dm.dump()))
+    for serialized in [
+        FORMAT_TAG_JSON + json.dumps(dm.dump()),
+        FORMAT_TAG_ZLIB_CBOR_B85 + base64.b85encode(compressed).decode(),
+        FORMAT_TAG_ZLIB_CBOR_B64 + base64.b64encode(compressed).decode(),
+        # untagged payloads of older versions
+        json.dumps(dm.dump()),
+        base64.b85encode(compressed).decode(),
+    ]:
+        assert_round_trip(dm, serialized)